@@ -0,0 +1,79 @@
+"""
+Compares the per-token balance_of loop with the chunked batch_balance_of path
+against a stubbed NEAR RPC that adds a fixed latency to every view call.
+
+    python -m benchmarks.bench_deposited_tokens --tokens 150 --latency 0.05
+"""
+import argparse
+import threading
+import time
+from zizza.near.intent_contract import IntentContract
+from zizza.near.token_catalog import TokenCatalog
+
+
+class StubAccount:
+    """Answers mt_batch_balance_of with a deterministic balance per token and counts round trips."""
+
+    def __init__(self, latency: float):
+        self.account_id = "bench.near"
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def view_function(self, contract_id, method_name, args):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return {"result": [str(int(token_id.split("-")[-1]) % 3 * 10 ** 6) for token_id in args["token_ids"]]}
+
+
+def make_contract(tokens: int) -> IntentContract:
+    catalog = TokenCatalog()
+    catalog.load([
+        {"defuse_asset_id": f"nep141:token-{i}", "symbol": f"TKN{i}", "decimals": 6,
+         "blockchain": "near", "contract_address": f"token-{i}", "price": 1.0}
+        for i in range(tokens)
+    ])
+    return IntentContract(catalog=catalog)
+
+
+def sequential(contract: IntentContract, account: StubAccount) -> dict:
+    deposited = {}
+    for chain in contract.available_tokens:
+        for asset in contract.available_tokens[chain].values():
+            balance = contract.balance_of(asset=asset, account=account)
+            if balance > 0.0:
+                deposited[asset.defuse_asset_id] = balance
+    return deposited
+
+
+def batched(contract: IntentContract, account: StubAccount, chunk_size: int) -> dict:
+    assets = [asset for chain in contract.available_tokens for asset in contract.available_tokens[chain].values()]
+    balances = contract.batch_balance_of(assets=assets, account=account, chunk_size=chunk_size)
+    return {asset_id: balance for asset_id, balance in balances.items() if balance > 0.0}
+
+
+def run(name: str, func, latency: float) -> dict:
+    account = StubAccount(latency=latency)
+    start = time.perf_counter()
+    result = func(account)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} round_trips={account.calls:<5} elapsed={elapsed * 1000:8.1f} ms  deposited={len(result)}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=150)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated RPC latency in seconds")
+    parser.add_argument("--chunk-size", type=int, default=50)
+    args = parser.parse_args()
+
+    contract = make_contract(args.tokens)
+    expected = run("sequential", lambda account: sequential(contract, account), args.latency)
+    result = run("batched", lambda account: batched(contract, account, args.chunk_size), args.latency)
+    assert result == expected, "batched balances differ from the sequential path"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Measures NEP-413 intents signed per second with the original borsh_construct based
+pipeline and with NEARAccount.sign_many, after checking both encoders produce the same bytes.
+
+    python -m benchmarks.bench_nep413_signing --intents 5000
+"""
+import argparse
+import base64
+import hashlib
+import json
+import secrets
+import time
+import base58
+import ed25519
+import near_api
+from borsh_construct import CStruct, String, Option, U8
+from zizza.near.account import NEARAccount
+from zizza.near.nep413_signer import base64_to_uint8_array, encode_payload, serialize_intent, standard_number
+
+Nep413PayloadSchema = CStruct(
+    "message" / String,
+    "nonce" / U8[32],
+    "recipient" / String,
+    "callback_url" / Option(String),
+)
+
+
+def reference_encode_payload(intent_message, recipient, nonce, standard="nep413") -> bytes:
+    """The encoder serialize_intent used before the bytes-level rewrite."""
+    payload_serialized = Nep413PayloadSchema.build({
+        "message": intent_message,
+        "nonce": base64_to_uint8_array(nonce),
+        "recipient": recipient,
+        "callback_url": None,
+    })
+    base_int = (2 ** 31) + standard_number[standard]
+    return base_int.to_bytes(4, byteorder='little', signed=False) + payload_serialized
+
+
+def reference_sign_intent(signer, message: dict) -> dict:
+    """NEARAccount._sign_intent as it was before the rewrite."""
+    standard = "nep413"
+    recipient = "intents.near"
+    nonce = base64.b64encode(secrets.token_bytes(32)).decode('utf-8')
+    msg_str = json.dumps(message, separators=(',', ':'))
+    signature = 'ed25519:' + base58.b58encode(
+        signer.sign(hashlib.sha256(reference_encode_payload(msg_str, recipient, nonce, standard)).digest())
+    ).decode('utf-8')
+    public_key = 'ed25519:' + base58.b58encode(signer.public_key).decode('utf-8')
+    return {
+        "standard": standard,
+        "payload": {"message": msg_str, "nonce": nonce, "recipient": recipient},
+        "signature": signature,
+        "public_key": public_key,
+    }
+
+
+def make_account() -> NEARAccount:
+    signing_key, _ = ed25519.create_keypair()
+    account = NEARAccount.__new__(NEARAccount)
+    account.account_id = "bench.near"
+    account.signer = near_api.signer.Signer(account.account_id, near_api.signer.KeyPair(
+        base58.b58encode(signing_key.to_bytes()).decode('utf-8')))
+    account.public_key = 'ed25519:' + base58.b58encode(account.signer.public_key).decode('utf-8')
+    return account
+
+
+def make_message(index: int) -> dict:
+    return {
+        "signer_id": "bench.near",
+        "deadline": "2030-01-01T00:00:00.000Z",
+        "intents": [{
+            "intent": "token_diff",
+            "diff": {"nep141:wrap.near": f"-{10 ** 24 + index}", "nep141:usdt.tether-token.near": str(index)},
+        }],
+    }
+
+
+def check_compatibility(samples: int = 1000):
+    for index in range(samples):
+        message = json.dumps(make_message(index), separators=(',', ':')) + "ü" * (index % 3)
+        nonce = base64.b64encode(secrets.token_bytes(32)).decode('utf-8')
+        assert encode_payload(message, "intents.near", nonce) == reference_encode_payload(message, "intents.near", nonce)
+        assert serialize_intent(message, "intents.near", base64.b64decode(nonce)) == \
+            hashlib.sha256(reference_encode_payload(message, "intents.near", nonce)).digest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intents", type=int, default=5000)
+    args = parser.parse_args()
+
+    check_compatibility()
+    account = make_account()
+    messages = [make_message(index) for index in range(args.intents)]
+
+    start = time.perf_counter()
+    for message in messages:
+        reference_sign_intent(account.signer, message)
+    before = args.intents / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    account.sign_many(messages)
+    after = args.intents / (time.perf_counter() - start)
+
+    message = json.dumps(messages[0], separators=(',', ':'))
+    nonce = base64.b64encode(secrets.token_bytes(32)).decode('utf-8')
+    start = time.perf_counter()
+    for _ in range(args.intents):
+        reference_encode_payload(message, "intents.near", nonce)
+    encode_before = args.intents / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(args.intents):
+        encode_payload(message, "intents.near", nonce)
+    encode_after = args.intents / (time.perf_counter() - start)
+
+    print(f"encoder   before={encode_before:10.0f}/s  after={encode_after:10.0f}/s  speedup={encode_after / encode_before:5.1f}x")
+    print(f"signing   before={before:10.0f}/s  after={after:10.0f}/s  speedup={after / before:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+A stand-in for zecwallet-cli speaking the same interactive protocol: one command per line on
+stdin, a JSON response and the "(main) Block:N (type 'help') >> " prompt on stdout.
+
+With --seed it recovers a wallet (creates the wallet file), prints its balance and exits, like
+the one-shot invocation used by ZcashWallet. A new block is mined every FAKE_ZEC_BLOCK_TIME
+seconds (default 2) and sent transactions are mined in the next block. FAKE_ZEC_LATENCY adds a
+delay to every command. FAKE_ZEC_PROMPT=0 leaves out the prompt, as when stdin is not a
+terminal, and prints a startup banner instead.
+
+    export ZIZZA_ZEC_LITE_BIN=$PWD/benchmarks/fake_zecwallet_cli.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import sys
+import time
+
+BLOCK_TIME = float(os.getenv("FAKE_ZEC_BLOCK_TIME", 2))
+LATENCY = float(os.getenv("FAKE_ZEC_LATENCY", 0))
+PROMPT = os.getenv("FAKE_ZEC_PROMPT", "1") != "0"
+START_HEIGHT = 2_800_000
+BALANCE = 100 * 10 ** 8
+UA_ADDRESS = "u1" + "fakeunifiedaddress" * 4
+T_ADDRESS = "t1" + "FakeTransparent" * 2
+WALLET_FILE = "zecwallet-light-wallet.dat"
+
+started_at = time.monotonic()
+
+
+def tip() -> int:
+    return START_HEIGHT + int((time.monotonic() - started_at) / BLOCK_TIME)
+
+
+class Wallet:
+    def __init__(self):
+        self.synced_height = tip()
+        self.spent = 0
+        self.transactions = []
+
+    def balance(self) -> dict:
+        zbalance = BALANCE - self.spent
+        return {
+            "zbalance": zbalance, "verified_zbalance": zbalance, "spendable_zbalance": zbalance,
+            "tbalance": 0, "uabalance": 0,
+            "ua_addresses": [{"address": UA_ADDRESS, "balance": zbalance}],
+            "z_addresses": [],
+            "t_addresses": [{"address": T_ADDRESS, "balance": 0}],
+        }
+
+    def handle(self, command: str, args: list):
+        if command == "balance":
+            return self.balance()
+        if command == "addresses":
+            return {"ua_addresses": [UA_ADDRESS], "z_addresses": [], "t_addresses": [T_ADDRESS]}
+        if command == "sync":
+            self.synced_height = tip()
+            return {"result": "success"}
+        if command == "height":
+            return {"height": self.synced_height}
+        if command == "info":
+            return {"version": "fake", "chain_name": "main", "latest_block_height": tip()}
+        if command == "defaultfee":
+            return {"defaultfee": 10000}
+        if command in ("send", "shield"):
+            if command == "send" and len(args) == 1:
+                # send '[{"address": ..., "amount": ...}, ...]'
+                value = sum(int(output["amount"]) for output in json.loads(args[0]))
+            else:
+                value = int(args[1]) if command == "send" else 0
+            txid = hashlib.sha256(f"{time.time_ns()}{args}".encode()).hexdigest()
+            self.spent += value
+            self.transactions.append({"txid": txid, "amount": -value, "mined_at": tip() + 1})
+            return {"result": "success", "txid": txid}
+        if command == "list":
+            return [{"txid": tx["txid"], "amount": tx["amount"], "block_height": tx["mined_at"],
+                     "unconfirmed": tx["mined_at"] > self.synced_height} for tx in self.transactions]
+        return {"error": f"unknown command {command}"}
+
+
+def prompt():
+    if not PROMPT:
+        return
+    sys.stdout.write(f"(main) Block:{tip()} (type 'help') >> ")
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--seed")
+    parser.add_argument("--birthday")
+    parser.add_argument("command", nargs="*")
+    args = parser.parse_args()
+    wallet = Wallet()
+    if args.seed:
+        os.makedirs(args.data_dir, exist_ok=True)
+        with open(os.path.join(args.data_dir, WALLET_FILE), "w") as f:
+            f.write("fake")
+        print(json.dumps(wallet.balance(), indent=2))
+        return
+    if not PROMPT:
+        print(f"[INFO] Lightclient connecting to {args.server}")
+    prompt()
+    for line in sys.stdin:
+        words = shlex.split(line)
+        if not words:
+            prompt()
+            continue
+        if words[0] in ("quit", "exit"):
+            print(json.dumps({"result": "success"}))
+            return
+        time.sleep(LATENCY)
+        print(json.dumps(wallet.handle(words[0], words[1:]), indent=2))
+        prompt()
+
+
+if __name__ == "__main__":
+    main()
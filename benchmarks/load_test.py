@@ -0,0 +1,206 @@
+"""
+Drives POST /execute at a target rate against a server wired to the local stub backends and the
+fake zecwallet-cli, and reports the batch latency (submission to the last SSE event) percentiles
+and the achieved throughput.
+
+    python -m benchmarks.load_test --scenario swap --rate 20 --duration 30 --sessions 4
+
+Scenarios: balance, swap, withdraw, deposit (wNEAR into intents.near), deposit_zec (through the
+omni bridge, waiting for the fake chain to mine it), mixed. Pass --server-url to load an
+already running server instead of starting one.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import base58
+import ed25519
+import requests
+
+from .stub_backends import StubBackends
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_CLI = os.path.join(ROOT_DIR, "benchmarks", "fake_zecwallet_cli.py")
+MNEMONICS = "abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about"
+
+SCENARIOS = {
+    "balance": [
+        {"command": "get_balance", "params": {"asset_symbol": "NEAR", "asset_chain": "near", "on_intent_contract": False}},
+        {"command": "get_balance", "params": {"asset_symbol": "wNEAR", "asset_chain": "near", "on_intent_contract": True}},
+        {"command": "get_balances", "params": {}},
+    ],
+    "swap": [
+        {"command": "swap", "params": {"asset_in_symbol": "wNEAR", "asset_in_chain": "near",
+                                        "asset_out_symbol": "USDC", "asset_out_chain": "near", "amount_in": 0.01}},
+    ],
+    "withdraw": [
+        {"command": "withdraw", "params": {"asset_symbol": "USDC", "asset_chain": "near", "amount": 0.5}},
+    ],
+    "deposit": [
+        {"command": "deposit", "params": {"asset_symbol": "wNEAR", "asset_chain": "near", "amount": 0.01}},
+    ],
+    "deposit_zec": [
+        {"command": "deposit", "params": {"asset_symbol": "ZEC", "asset_chain": "zec", "amount": 0.01}},
+    ],
+}
+MIXED = ("balance", "balance", "swap", "withdraw", "deposit")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def random_near_key() -> str:
+    signing_key, _ = ed25519.create_keypair()
+    return "ed25519:" + base58.b58encode(signing_key.to_bytes()).decode()
+
+
+def start_server(stubs: StubBackends, port: int, workdir: str, extra_env: dict) -> subprocess.Popen:
+    env = {**os.environ, **stubs.env, **extra_env,
+           "ZIZZA_ZEC_LITE_BIN": FAKE_CLI,
+           "ZIZZA_ZEC_DATA_DIR": os.path.join(workdir, "zcash"),
+           "ZIZZA_ZCASH_SERVER": f"{stubs.url}/zcash"}
+    env.pop("ZIZZA_STORAGE_CACHE_PATH", None)
+    env.pop("ZIZZA_PUBLIC_KEY_CACHE_PATH", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, "server.log"), "w"))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited, see {workdir}/server.log")
+        try:
+            requests.get(f"{url}/tasks/stats", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start within 30s")
+
+
+def follow(session: requests.Session, url: str, task_id: str) -> str:
+    """Reads the task event stream until its end event, returning the final status."""
+    with session.get(f"{url}/stream/{task_id}", stream=True, timeout=600) as response:
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event in ("end", "error"):
+                return json.loads(line[len("data: "):]).get("status", "Task not found")
+    return "Stream closed"
+
+
+def run_batch(url: str, operations: list, session_id: str, mode: str, local: threading.local) -> tuple:
+    session = getattr(local, "session", None)
+    if session is None:
+        session = local.session = requests.Session()
+    start = time.perf_counter()
+    response = session.post(f"{url}/execute", params={"session_id": session_id, "mode": mode}, json=operations, timeout=60)
+    if response.status_code == 429:
+        return "rejected", time.perf_counter() - start
+    response.raise_for_status()
+    status = follow(session, url, response.json()["task_id"])
+    return status, time.perf_counter() - start
+
+
+def set_agents(url: str, sessions: int) -> list:
+    session_ids = []
+    for index in range(sessions):
+        session_id = f"bench-{index}"
+        operations = [{"command": "set_agent", "params": {
+            "near_account_id": f"{session_id}.near", "near_ed25519_key": random_near_key(),
+            "zec_mnemonics": MNEMONICS, "zec_wallet_birthday": 1}}]
+        status, _ = run_batch(url, operations, session_id, "sequential", threading.local())
+        if status != "Completed":
+            raise RuntimeError(f"set_agent of {session_id} ended with {status}")
+        session_ids.append(session_id)
+    return session_ids
+
+
+def load(url: str, scenario: str, rate: float, duration: float, session_ids: list, mode: str, concurrency: int) -> dict:
+    local = threading.local()
+    futures = []
+    interval = 1 / rate
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        sent = 0
+        while time.perf_counter() - start < duration:
+            name = random.choice(MIXED) if scenario == "mixed" else scenario
+            futures.append(executor.submit(run_batch, url, SCENARIOS[name], random.choice(session_ids), mode, local))
+            sent += 1
+            # open loop: keep the schedule even when responses are slow
+            time.sleep(max(start + sent * interval - time.perf_counter(), 0))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    latencies = [latency for status, latency in results if status == "Completed"]
+    return {
+        "scenario": scenario,
+        "target_rate": rate,
+        "submitted": len(results),
+        "completed": len(latencies),
+        "failed": sum(1 for status, _ in results if status not in ("Completed", "rejected")),
+        "rejected": sum(1 for status, _ in results if status == "rejected"),
+        "batches_per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies, default=float("nan")) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["mixed"], default="balance")
+    parser.add_argument("--rate", type=float, default=10, help="batches submitted per second")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--sessions", type=int, default=4, help="agents the batches are spread over")
+    parser.add_argument("--mode", choices=("sequential", "dag"), default="sequential")
+    parser.add_argument("--concurrency", type=int, default=256, help="maximum batches in flight")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added by the stub backends to every call")
+    parser.add_argument("--settlement-delay", type=float, default=0.5, help="seconds before a published intent settles")
+    parser.add_argument("--block-time", type=float, default=2, help="seconds between blocks of the fake Zcash chain")
+    parser.add_argument("--server-url", help="an already running server, wired to the stubs by the caller")
+    args = parser.parse_args()
+
+    stubs = server = None
+    with tempfile.TemporaryDirectory(prefix="zizza-bench-") as workdir:
+        try:
+            if args.server_url:
+                url = args.server_url.rstrip("/")
+            else:
+                stubs = StubBackends(latency=args.latency, settlement_delay=args.settlement_delay).start()
+                port = free_port()
+                server = start_server(stubs, port, workdir, {"FAKE_ZEC_BLOCK_TIME": str(args.block_time)})
+                url = f"http://127.0.0.1:{port}"
+            session_ids = set_agents(url, args.sessions)
+            report = load(url, args.scenario, args.rate, args.duration, session_ids, args.mode, args.concurrency)
+            if stubs:
+                report["backend_calls"] = dict(sorted(stubs.state.calls.items()))
+            print(json.dumps(report, indent=2))
+        finally:
+            if server:
+                server.terminate()
+                server.wait(10)
+            if stubs:
+                stubs.stop()
+
+
+if __name__ == "__main__":
+    main()
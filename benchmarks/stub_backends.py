@@ -0,0 +1,264 @@
+"""
+Local stand-ins for every backend the server talks to, served from one HTTP server:
+
+    /solver        solver relay JSON-RPC (quote, publish_intent, get_status, batches)
+    /near          NEAR JSON-RPC (query, block, broadcast_tx_commit/async, tx) and GET /near/status
+    /bridge        omni bridge JSON-RPC (supported_tokens, deposit_address)
+    /tokens        token catalog
+
+Every response is delayed by `latency` seconds, and published intents settle
+`settlement_delay` seconds after they are published.
+
+    python -m benchmarks.stub_backends --port 8900 --latency 0.05 --settlement-delay 1
+"""
+import argparse
+import base64
+import hashlib
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import base58
+
+WNEAR = {"defuse_asset_id": "nep141:wrap.near", "symbol": "wNEAR", "decimals": 24, "blockchain": "near",
+         "contract_address": "wrap.near", "price": 3.1, "price_updated_at": "2025-01-01T00:00:00.000Z"}
+USDC = {"defuse_asset_id": "nep141:usdc.near", "symbol": "USDC", "decimals": 6, "blockchain": "near",
+        "contract_address": "usdc.near", "price": 1.0, "price_updated_at": "2025-01-01T00:00:00.000Z"}
+ZEC = {"defuse_asset_id": "nep141:zec.omft.near", "symbol": "ZEC", "decimals": 8, "blockchain": "zec",
+       "contract_address": "zec.omft.near", "price": 35.0, "price_updated_at": "2025-01-01T00:00:00.000Z"}
+CATALOG = [WNEAR, USDC, ZEC]
+BRIDGE_TOKENS = [{
+    "defuse_asset_identifier": "zec:mainnet:native", "near_token_id": "zec.omft.near", "asset_name": "ZEC",
+    "decimals": 8, "min_deposit_amount": "100000", "min_withdrawal_amount": "100000", "withdrawal_fee": "10000",
+}]
+# Large enough for any benchmark to never run out of funds
+BALANCE = 10 ** 40
+DEPOSIT_ADDRESS = "t1" + "Bench" * 7
+
+
+def _json_bytes(value) -> list:
+    return list(json.dumps(value).encode("utf-8"))
+
+
+def _expiration_time(seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class BackendState:
+    """What the stubs remember between calls, and how many calls each route received."""
+
+    def __init__(self, settlement_delay: float):
+        self.settlement_delay = settlement_delay
+        self.intents = {}
+        self.calls = {}
+        self.nonce = 0
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def next_nonce(self) -> int:
+        with self._lock:
+            self.nonce += 1
+            return self.nonce
+
+    def publish(self) -> str:
+        intent_hash = base58.b58encode(secrets.token_bytes(32)).decode()
+        with self._lock:
+            self.intents[intent_hash] = time.monotonic()
+        return intent_hash
+
+    def intent_status(self, intent_hash: str) -> dict:
+        published_at = self.intents.get(intent_hash)
+        if published_at is None:
+            return {"status": "NOT_FOUND_OR_NOT_VALID", "intent_hash": intent_hash}
+        if time.monotonic() - published_at < self.settlement_delay:
+            return {"status": "PENDING", "intent_hash": intent_hash}
+        tx_hash = base58.b58encode(hashlib.sha256(intent_hash.encode()).digest()).decode()
+        return {"status": "SETTLED", "intent_hash": intent_hash, "data": {"hash": tx_hash}}
+
+
+def solver_rpc(state: BackendState, request: dict):
+    method = request.get("method")
+    params = (request.get("params") or [{}])[0]
+    state.count(f"solver.{method}")
+    if method == "quote":
+        amount_in = params["exact_amount_in"]
+        return [{
+            "quote_hash": base58.b58encode(secrets.token_bytes(32)).decode(),
+            "defuse_asset_identifier_in": params["defuse_asset_identifier_in"],
+            "defuse_asset_identifier_out": params["defuse_asset_identifier_out"],
+            "amount_in": amount_in,
+            "amount_out": str(max(int(amount_in) // 2, 1)),
+            "expiration_time": _expiration_time(60),
+        }]
+    if method == "publish_intent":
+        return {"status": "OK", "intent_hash": state.publish()}
+    if method == "get_status":
+        return state.intent_status(params["intent_hash"])
+    raise ValueError(f"unknown solver method {method}")
+
+
+def near_view_call(method_name: str, args: dict):
+    if method_name == "mt_batch_balance_of":
+        return [str(BALANCE)] * len(args["token_ids"])
+    if method_name == "ft_balance_of":
+        return str(BALANCE)
+    if method_name == "storage_balance_of":
+        return {"total": "1250000000000000000000", "available": "0"}
+    if method_name == "has_public_key":
+        return True
+    return None
+
+
+def near_rpc(state: BackendState, request: dict):
+    method = request.get("method")
+    params = request.get("params")
+    if method == "query":
+        request_type = params["request_type"]
+        state.count(f"near.{request_type}")
+        if request_type == "view_account":
+            return {"amount": str(BALANCE), "locked": "0", "code_hash": "11111111111111111111111111111111",
+                    "storage_usage": 1000, "block_height": 1, "block_hash": "11111111111111111111111111111111"}
+        if request_type == "view_access_key":
+            return {"nonce": state.next_nonce() * 1000, "permission": "FullAccess",
+                    "block_height": 1, "block_hash": "11111111111111111111111111111111"}
+        if request_type == "call_function":
+            args = json.loads(base64.b64decode(params["args_base64"]) or b"{}")
+            return {"result": _json_bytes(near_view_call(params["method_name"], args)), "logs": [],
+                    "block_height": 1, "block_hash": "11111111111111111111111111111111"}
+        raise ValueError(f"unknown query {request_type}")
+    state.count(f"near.{method}")
+    if method == "block":
+        return {"header": {"hash": base58.b58encode(b"\x01" * 32).decode(), "height": 1}}
+    if method in ("broadcast_tx_commit", "broadcast_tx_async", "send_tx"):
+        signed_tx = params[0] if isinstance(params, list) else params["signed_tx_base64"]
+        tx_hash = base58.b58encode(hashlib.sha256(base64.b64decode(signed_tx)).digest()).decode()
+        if method == "broadcast_tx_async":
+            return tx_hash
+        return {"status": {"SuccessValue": ""}, "transaction": {"hash": tx_hash},
+                "transaction_outcome": {"id": tx_hash, "outcome": {"logs": [], "status": {"SuccessValue": ""}}},
+                "receipts_outcome": []}
+    if method in ("tx", "EXPERIMENTAL_tx_status"):
+        tx_hash = params[0] if isinstance(params, list) else params["tx_hash"]
+        return {"status": {"SuccessValue": ""}, "transaction": {"hash": tx_hash},
+                "transaction_outcome": {"id": tx_hash, "outcome": {"logs": [], "status": {"SuccessValue": ""}}},
+                "receipts_outcome": []}
+    raise ValueError(f"unknown near method {method}")
+
+
+def bridge_rpc(state: BackendState, request: dict):
+    method = request.get("method")
+    state.count(f"bridge.{method}")
+    if method == "supported_tokens":
+        return {"tokens": BRIDGE_TOKENS}
+    if method == "deposit_address":
+        return {"address": DEPOSIT_ADDRESS, "chain": request["params"][0]["chain"]}
+    raise ValueError(f"unknown bridge method {method}")
+
+
+ROUTES = {"/solver": solver_rpc, "/near": near_rpc, "/bridge": bridge_rpc}
+
+
+class StubBackends:
+    """Runs every stub on one threaded HTTP server, in a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, settlement_delay: float = 1.0):
+        self.latency = latency
+        self.state = BackendState(settlement_delay)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def env(self) -> dict:
+        """The environment variables pointing the server at these stubs."""
+        return {
+            "ZIZZA_SOLVER_URL": f"{self.url}/solver",
+            "ZIZZA_NEAR_RPC_URL": f"{self.url}/near",
+            "ZIZZA_OMNI_BRIDGE_URL": f"{self.url}/bridge",
+            "ZIZZA_TOKENS_URL": f"{self.url}/tokens",
+        }
+
+    def start(self) -> "StubBackends":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-backends", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                time.sleep(stubs.latency)
+                if self.path == "/tokens":
+                    stubs.state.count("tokens")
+                    return self._reply(200, {"items": CATALOG})
+                if self.path == "/near/status":
+                    stubs.state.count("near.status")
+                    return self._reply(200, {"sync_info": {"latest_block_hash": base58.b58encode(b"\x01" * 32).decode(),
+                                                           "latest_block_height": 1}})
+                self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+                time.sleep(stubs.latency)
+                handler = ROUTES.get(self.path)
+                if handler is None:
+                    return self._reply(404, {"error": "not found"})
+                requests = body if isinstance(body, list) else [body]
+                responses = []
+                for request in requests:
+                    try:
+                        responses.append({"jsonrpc": "2.0", "id": request.get("id"), "result": handler(stubs.state, request)})
+                    except Exception as e:
+                        responses.append({"jsonrpc": "2.0", "id": request.get("id"), "error": {"message": str(e)}})
+                self._reply(200, responses if isinstance(body, list) else responses[0])
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--settlement-delay", type=float, default=1.0, help="seconds before a published intent settles")
+    args = parser.parse_args()
+    stubs = StubBackends(args.host, args.port, args.latency, args.settlement_delay).start()
+    for name, value in stubs.env.items():
+        print(f"export {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stubs.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,259 @@
+import asyncio
+import json
+import os
+import time
 import uuid
-import threading
-from fastapi import FastAPI
-from typing import List, Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Query, Header, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Callable, List, Dict, Any, Optional
 from zizza.api import API
+from zizza.registry import AgentRegistry, DEFAULT_SESSION, MAX_AGENTS, AGENT_IDLE_TIMEOUT
+from zizza.executor import ExecutionEngine, QueueFullError, then, EXECUTION_WORKERS, EXECUTION_QUEUE_SIZE, READ_ONLY_CONCURRENCY, SIGNING_CONCURRENCY
+from zizza.task_store import TaskStore, TASK_TTL, TASK_STORE_MAX_ENTRIES, TASK_STORE_MAX_BYTES
+from zizza.scheduler import DagScheduler, SchedulingError, plan, DAG_CONCURRENCY
+from zizza.metrics import REGISTRY, COMMAND_LATENCY, COMMAND_ERRORS, CONTENT_TYPE, Gauge, observe_future
 
 app = FastAPI()
-tasks = {}
-api = API()
+tasks = TaskStore(
+    ttl=float(os.getenv("ZIZZA_TASK_TTL", TASK_TTL)),
+    max_entries=int(os.getenv("ZIZZA_TASK_STORE_MAX_ENTRIES", TASK_STORE_MAX_ENTRIES)),
+    max_bytes=int(os.getenv("ZIZZA_TASK_STORE_MAX_BYTES", TASK_STORE_MAX_BYTES)),
+)
+registry = AgentRegistry(
+    max_agents=int(os.getenv("ZIZZA_MAX_AGENTS", MAX_AGENTS)),
+    idle_timeout=float(os.getenv("ZIZZA_AGENT_IDLE_TIMEOUT", AGENT_IDLE_TIMEOUT)),
+)
+api = API(registry=registry)
 
-def execute_operations(task_id: str, operations: List[Dict[str, Any]]):
-    operations_count = len(operations)
+BUNDLEABLE_COMMANDS = ("swap", "withdraw")
+# Commands run through their start_ variant, returning a future resolved once their intent settles
+SETTLING_COMMANDS = ("swap", "withdraw", "bundle")
+# Seconds between SSE comments keeping idle streams open through proxies
+STREAM_KEEPALIVE = 15
+
+def group_operations(operations: List[Dict[str, Any]], bundle: bool) -> List[List[int]]:
+    """Splits a batch in steps of operation indexes; with bundling, consecutive swaps and withdrawals share a step."""
+    steps = []
     for index, operation in enumerate(operations):
-        command = operation.get("command")
-        params = operation.get("params", {})
-        tasks[task_id]['status'] = f"Processing {index + 1}/{operations_count}"
+        bundleable = bundle and isinstance(operation, dict) and operation.get("command") in BUNDLEABLE_COMMANDS
+        if bundleable and steps and operations[steps[-1][-1]].get("command") in BUNDLEABLE_COMMANDS:
+            steps[-1].append(index)
+        else:
+            steps.append([index])
+    return steps
+
+def run_operation(session_api: API, operation: Dict[str, Any]) -> Future:
+    """
+    Runs an operation, returning a future of its result. Settling commands return once their intent
+    is published and their future is resolved when it settles, so no thread waits for the settlement.
+    """
+    command = operation.get("command")
+    params = operation.get("params", {})
+    if not command or not isinstance(params, dict):
+        raise ValueError("Invalid command format")
+    settling = command in SETTLING_COMMANDS
+    method = getattr(session_api, f"start_{command}" if settling else command, None)
+    if not callable(method) or command.startswith("start_"):
+        raise ValueError(f"Unknown command: {command}")
+    started = time.perf_counter()
+    outcome = Future()
+    try:
+        with engine.command_slot(command):
+            result = method(**params)
+    except Exception as e:
+        outcome.set_exception(e)
+    else:
+        if settling:
+            outcome = result
+        else:
+            outcome.set_result(result)
+    return observe_future(COMMAND_LATENCY, COMMAND_ERRORS, outcome, started=started, command=command)
+
+def start_step(session_api: API, operations: List[Dict[str, Any]], step: List[int]) -> Future:
+    """Starts a step of a sequential batch, returning a future of the results of its operations."""
+    if len(step) == 1:
+        return then(run_operation(session_api, operations[step[0]]), lambda result: [result])
+    bundled = run_operation(session_api, {"command": "bundle", "params": {"operations": [operations[i] for i in step]}})
+    return then(bundled, lambda result: result["results"])
+
+def execute_dag(task_id: str, operations: List[Dict[str, Any]], session_api: API, on_finish: Callable[[], None] = None):
+    scheduler = DagScheduler(
+        plan(operations),
+        run=lambda operation: run_operation(session_api, operation),
+        on_result=lambda index, entry: tasks.append_result(task_id, entry),
+        executor=dag_executor,
+        on_progress=lambda finished, total: tasks.set_status(task_id, f"Processing {min(finished + 1, total)}/{total}"),
+    )
+
+    def finish():
+        if scheduler.aborted_at is not None:
+            tasks.finish(task_id, f"Failed at {scheduler.aborted_at + 1}/{len(operations)}")
+        elif scheduler.failed:
+            tasks.finish(task_id, f"Completed with {len(scheduler.failed)} failed")
+        else:
+            tasks.finish(task_id, "Completed")
+        if on_finish:
+            on_finish()
 
+    scheduler.start(on_finish=finish)
+
+def execute_operations(task_id: str, operations: List[Dict[str, Any]], session_api: API, bundle: bool = False,
+                       on_finish: Callable[[], None] = None, steps: List[List[int]] = None, position: int = 0,
+                       settled: Future = None):
+    """
+    Runs the steps of a sequential batch from `position`. A step still settling returns the worker:
+    the batch is resumed on the engine with the `settled` future of that step once it is done.
+    """
+    steps = group_operations(operations, bundle) if steps is None else steps
+    operations_count = len(operations)
+    while position < len(steps):
+        step = steps[position]
+        if settled is None:
+            tasks.set_status(task_id, f"Processing {step[0] + 1}/{operations_count}")
+            try:
+                settled = start_step(session_api, operations, step)
+            except Exception as e:
+                settled = Future()
+                settled.set_exception(e)
+            if not settled.done():
+                settled.add_done_callback(lambda _, position=position, settled=settled: engine.resume(
+                    task_id, execute_operations, operations, session_api, bundle, on_finish, steps, position, settled))
+                return
         try:
-            if not command or not isinstance(params, dict):
-                raise ValueError("Invalid command format")
-            
-            method = getattr(api, command, None)
-            if not callable(method):
-                raise ValueError(f"Unknown command: {command}")
-            
-            tasks[task_id]['results'].append({"command": command, "params": params, "result": method(**params)})
+            results = settled.result()
         except Exception as e:
-            tasks[task_id]['status'] = f"Failed at {index + 1}/{operations_count}"
-            tasks[task_id]['results'].append({"command": command, "params": params, "error": str(e)})
-            return
-            
-    tasks[task_id]['status'] = "Completed"
+            for i in step:
+                tasks.append_result(task_id, {"command": operations[i].get("command"), "params": operations[i].get("params", {}), "error": str(e)})
+            tasks.finish(task_id, f"Failed at {step[0] + 1}/{operations_count}")
+            break
+        for i, result in zip(step, results):
+            tasks.append_result(task_id, {"command": operations[i].get("command"), "params": operations[i].get("params", {}), "result": result})
+        settled = None
+        position += 1
+    else:
+        tasks.finish(task_id, "Completed")
+    if on_finish:
+        on_finish()
+
+def run_batch(task_id: str, operations: List[Dict[str, Any]], session_api: API, bundle: bool = False, mode: str = "sequential"):
+    """
+    Starts a batch, keeping the agent of its session from being expired, evicted or closed until the
+    batch finishes, which may be after this returns while an intent settles.
+    """
+    registry, session_id = session_api.registry, session_api.session_id
+    registry.acquire(session_id)
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            registry.release(session_id)
+
+    try:
+        if mode == "dag":
+            execute_dag(task_id, operations, session_api, on_finish=release)
+        else:
+            execute_operations(task_id, operations, session_api, bundle, on_finish=release)
+    except BaseException:
+        release()
+        raise
+
+engine = ExecutionEngine(
+    run_batch,
+    workers=int(os.getenv("ZIZZA_EXECUTION_WORKERS", EXECUTION_WORKERS)),
+    queue_size=int(os.getenv("ZIZZA_EXECUTION_QUEUE_SIZE", EXECUTION_QUEUE_SIZE)),
+    read_only_concurrency=int(os.getenv("ZIZZA_READ_ONLY_CONCURRENCY", READ_ONLY_CONCURRENCY)),
+    signing_concurrency=int(os.getenv("ZIZZA_SIGNING_CONCURRENCY", SIGNING_CONCURRENCY)),
+)
+engine.start()
+REGISTRY.register(Gauge("zizza_execution_queue_depth", "Batches waiting for a worker.", callback=lambda: engine.queue_depth))
+REGISTRY.register(Gauge("zizza_execution_active_batches", "Batches being run by a worker.", callback=lambda: engine.active))
+REGISTRY.register(Gauge("zizza_tasks", "Tasks held by the task store.", callback=lambda: tasks.stats()["entries"]))
+REGISTRY.register(Gauge("zizza_tasks_running", "Tasks not finished yet.", callback=lambda: tasks.stats()["running"]))
+REGISTRY.register(Gauge("zizza_agents", "Live agents.", callback=lambda: len(registry)))
+dag_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ZIZZA_DAG_CONCURRENCY", DAG_CONCURRENCY)), thread_name_prefix="dag-operation")
 
 @app.post("/execute")
-def execute(operations: List[Dict[str, Any]]):
+def execute(operations: List[Dict[str, Any]], session_id: str = DEFAULT_SESSION, bundle: bool = False,
+            mode: str = Query("sequential", pattern="^(sequential|dag)$")):
+    if mode == "dag":
+        if bundle:
+            raise HTTPException(status_code=400, detail="bundle is not supported in dag mode")
+        try:
+            plan(operations)
+        except SchedulingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     task_id = str(uuid.uuid4())
-    tasks[task_id] = {"status": "Pending", "results": []}
+    tasks.create(task_id)
     
-    thread = threading.Thread(target=execute_operations, args=(task_id, operations))
-    thread.start()
+    try:
+        engine.submit(task_id, operations, api.for_session(session_id), bundle, mode)
+    except QueueFullError as e:
+        tasks.delete(task_id)
+        raise HTTPException(status_code=429, detail=str(e))
     
     return {"task_id": task_id}
 
 @app.get("/status/{task_id}")
-def get_status(task_id: str):
-    return tasks.get(task_id, {"error": "Task not found"})
\ No newline at end of file
+def get_status(task_id: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+    task = tasks.get(task_id, offset=offset, limit=limit)
+    if not task:
+        return {"error": "Task not found"}
+    if task['status'] == "Pending":
+        return {**task, "queue_position": engine.queue_position(task_id)}
+    return task
+
+@app.get("/stream/{task_id}")
+async def stream_task(task_id: str, request: Request, last_event_id: Optional[int] = Query(None, ge=0),
+                      last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")):
+    """Streams the task events as server-sent events, resuming after the given last event id."""
+    if last_event_id is None:
+        last_event_id = int(last_event_id_header) if last_event_id_header and last_event_id_header.isdigit() else 0
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def listener():
+        loop.call_soon_threadsafe(changed.set)
+
+    async def event_stream():
+        last_id = last_event_id
+        tasks.subscribe(task_id, listener)
+        try:
+            while True:
+                changed.clear()
+                polled = tasks.events(task_id, after=last_id)
+                if polled is None:
+                    yield f"event: error\ndata: {json.dumps({'error': 'Task not found'})}\n\n"
+                    return
+                events, finished = polled
+                for event_id, kind, data in events:
+                    yield f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+                    last_id = event_id
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+        finally:
+            tasks.unsubscribe(task_id, listener)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/tasks/stats")
+def get_tasks_stats():
+    return tasks.stats()
+
+@app.get("/agents/stats")
+def get_agents_stats():
+    return registry.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,36 +1,200 @@
-from typing import List
-from .near.asset import AvailableToken, BridgeableToken
-from .near.intent_contract import IntentContract
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, List
+import contextvars
+import copy
+import threading
+import time
+import bip39
+from .executor import then
+from .balance_cache import BalanceCache, FT_BALANCE, INTENTS_BALANCE, NEAR_BALANCE, ZEC_BALANCE
+from .near.asset import AvailableToken, BridgeableToken, Token
+from .near.intent_contract import IntentContract, INTENTS_CONTRACT_ID
 from .near.omni_bridge import OmniBridge
 from .near.solver import Solver
-from .near.account import NEARAccount
-from .zcash.wallet import ZcashWallet
+from .near.token_registry import normalize_chain
+from .near.account import FT_TRANSFER_GAS, NEARAccount, generate_deadline
+from .near.quote_cache import parse_expiration_time
+from .zcash.wallet import ZcashWallet, open_wallet
+
+BALANCE_MAX_WORKERS = 8
+
+def _run_in_background(func, *args, **kwargs) -> Future:
+    future = Future()
+    # carries the signing slots of the running operation over to the thread
+    context = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(func, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=getattr(func, "__name__", "agent-startup"), daemon=True).start()
+    return future
+
+class _LazyComponent:
+    """Builds a component exactly once, on first use or in the background, recording how long it took."""
+
+    def __init__(self, name: str, factory: Callable, timings: dict):
+        self.name = name
+        self.factory = factory
+        self.timings = timings
+        self._future: Future = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        start = time.perf_counter()
+        try:
+            return self.factory()
+        finally:
+            self.timings[self.name] = round(time.perf_counter() - start, 3)
+
+    def start(self) -> Future:
+        with self._lock:
+            if self._future is None:
+                self._future = _run_in_background(self._build)
+            return self._future
+
+    def get(self):
+        with self._lock:
+            if self._future is not None and self._future.done() and self._future.exception() is not None:
+                # retry components that failed to build
+                self._future = None
+            future, build_here = self._future, self._future is None
+            if build_here:
+                future = self._future = Future()
+                future.set_running_or_notify_cancel()
+        if build_here:
+            try:
+                future.set_result(self._build())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    @property
+    def built(self) -> bool:
+        return self._future is not None and self._future.done() and not self._future.exception()
 
 class Agent:
-    def __init__(self, near_account_id: str, near_ed25519_key: str, zec_mnemonics: str, zec_wallet_birthday: int):
-        self._zec_wallet = ZcashWallet(mnemonics=zec_mnemonics, birthday=zec_wallet_birthday)
-        self._near_account = NEARAccount(account_id=near_account_id, prv_key=near_ed25519_key)
-        self._intent_contract = IntentContract()
-        self._near_account._register_intent_public_key(contract_address=self._intent_contract.contract_id)
-        self._omni_bridge = OmniBridge()
+    def __init__(self, near_account_id: str, near_ed25519_key: str, zec_mnemonics: str, zec_wallet_birthday: int, register_in_background: bool = True, eager: bool = False):
+        """Components are built on first use; with `eager` they are all built concurrently right away."""
+        if zec_mnemonics and not bip39.check_phrase(phrase=zec_mnemonics):
+            raise ValueError("invalid mnemonic phrase")
+        self.startup_timings = {}
+        self._components = {
+            name: _LazyComponent(name, factory, self.startup_timings) for name, factory in (
+                ("zec_wallet", lambda: open_wallet(zec_mnemonics, birthday=zec_wallet_birthday)),
+                ("near_account", lambda: NEARAccount(account_id=near_account_id, prv_key=near_ed25519_key)),
+                ("intent_contract", self._build_intent_contract),
+                ("public_key_registration", lambda: self._near_account._register_intent_public_key(contract_address=INTENTS_CONTRACT_ID)),
+                ("omni_bridge", OmniBridge),
+            )
+        }
         self._solver = Solver()
+        self._balance_cache = BalanceCache()
+        if eager:
+            futures = [component.start() for component in self._components.values()]
+            wait(futures)
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # the components built so far hold processes and locks, e.g. the zecwallet-cli session
+                self.close()
+                raise
+        elif register_in_background:
+            # Publishing intents waits for the key registration, nothing else depends on it
+            self._components["public_key_registration"].start()
+        else:
+            self._components["public_key_registration"].get()
+
+    @staticmethod
+    def _build_intent_contract() -> IntentContract:
+        intent_contract = IntentContract()
+        intent_contract.available_tokens  # warm the shared token catalog
+        return intent_contract
+
+    @property
+    def _zec_wallet(self) -> ZcashWallet:
+        return self._components["zec_wallet"].get()
+
+    @property
+    def _near_account(self) -> NEARAccount:
+        return self._components["near_account"].get()
+
+    @property
+    def _intent_contract(self) -> IntentContract:
+        return self._components["intent_contract"].get()
+
+    @property
+    def _omni_bridge(self) -> OmniBridge:
+        return self._components["omni_bridge"].get()
+
+    def close(self):
+        if self._components["zec_wallet"].built:
+            self._zec_wallet.close()
+
+    @contextmanager
+    def _invalidates(self, *targets):
+        """Invalidates the cached balances changed by an operation once it ends, even if it fails.
+
+        Targets are balance sources or (source, key) pairs; the block may append more to the yielded list.
+        """
+        targets = list(targets)
+        try:
+            yield targets
+        finally:
+            self._invalidate(targets)
+
+    def _invalidate(self, targets: list):
+        for target in targets:
+            if isinstance(target, tuple):
+                self._balance_cache.invalidate(*target)
+            else:
+                self._balance_cache.invalidate(target)
+
+    def _get_token(self, symbol: str, chain: str) -> Token:
+        """Returns a token from the registry: its intents catalog entry on NEAR, its omni bridge entry elsewhere."""
+        if normalize_chain(chain) == "near":
+            return self._intent_contract.get_token(symbol=symbol, chain=chain)
+        return self._omni_bridge.get_token(symbol=symbol, chain=chain)
+
+    def _near_balance(self) -> float:
+        return self._balance_cache.get(NEAR_BALANCE, self._near_account.account_id, lambda: int(
+            self._near_account.view_account(self._near_account.account_id)['amount']) / 10 ** 24)
+
+    def _token_balance(self, asset: AvailableToken) -> float:
+        return self._balance_cache.get(FT_BALANCE, asset.defuse_asset_id, lambda: asset.balance_of(account=self._near_account))
+
+    def _zec_balance(self) -> float:
+        # the wallet is only built, or its failure raised, when the balance is not cached
+        return self._balance_cache.get(ZEC_BALANCE, "balance", lambda: self._zec_wallet.get_balance())
+
+    def _intent_balances(self, assets: List[AvailableToken]) -> dict:
+        """Returns the {defuse_asset_id: balance} of assets in intents.near, batching the uncached ones."""
+        by_id = {asset.get_asset_id(): asset for asset in assets}
+        return self._balance_cache.get_many(INTENTS_BALANCE, by_id, lambda asset_ids: self._intent_contract.batch_balance_of(
+            assets=[by_id[asset_id] for asset_id in asset_ids], account=self._near_account))
     
     def get_wallet_summary(self) -> dict:
         return {
-            "ZEC": self._zec_wallet.get_wallet_summary(),
-            "NEAR": self._near_account.get_account_balance()
+            "ZEC": self._balance_cache.get(ZEC_BALANCE, "summary", self._zec_wallet.get_wallet_summary),
+            "NEAR": self.get_account_balance()
             }
     
+    def get_account_balance(self) -> dict:
+        return {"address": self._near_account.account_id, "balance": self._near_balance()}
+
     def get_deposited_tokens(self) -> dict:
-        deposited = {}
-        for chain in self._intent_contract.available_tokens:
-            for asset in self._intent_contract.available_tokens[chain].values():
-                balance = self._intent_contract.balance_of(asset=asset, account=self._near_account)
-                if balance > 0.0:
-                    deposited[asset.defuse_asset_id] = balance
-        return deposited
+        assets = [asset for chain in self._intent_contract.available_tokens
+                  for asset in self._intent_contract.available_tokens[chain].values()]
+        balances = self._intent_balances(assets)
+        return {asset_id: balance for asset_id, balance in balances.items() if balance > 0.0}
     
-    def get_token_price(self, asset_symbol: str, asset_chain: str) -> tuple[float, str]:
+    def get_token_price(self, asset_symbol: str, asset_chain: str) -> tuple[float, str, float]:
         return self._intent_contract.get_token_price(symbol=asset_symbol, chain=asset_chain)
     
     def get_chains(self) -> List[str]:
@@ -46,50 +210,139 @@ class Agent:
         if asset_symbol == "NEAR":
             if on_intent_contract:
                 raise ValueError("only wNEAR exists in intents.near")
-            return int(self._near_account.view_account(self._near_account.account_id)['amount']) / 10 ** 24
+            return self._near_balance()
         asset: AvailableToken = self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
         if on_intent_contract:
-            deposited = self.get_deposited_tokens()
-            balance = deposited.get(asset.defuse_asset_id)
+            balance = self._intent_balances([asset]).get(asset.defuse_asset_id)
             if not balance:
                 raise ValueError(f"{asset.symbol} has not been deposited yet")
             return balance
         elif asset.symbol == "ZEC":
-            return self._zec_wallet.get_balance()
+            return self._zec_balance()
         else:
-            return asset.balance_of(account=self._near_account)
+            return self._token_balance(asset)
+
+    def get_balances(self, assets: List[tuple] = None, max_workers: int = BALANCE_MAX_WORKERS) -> List[tuple]:
+        """Fetches many (symbol, chain, on_intent_contract) balances with one read per source, concurrently.
+
+        Intent balances share one batched mt_batch_balance_of lookup, the ZEC wallet is queried once and
+        NEAR with one view_account, each skipped while its balances are cached. Without `assets`, every held asset is returned: NEAR, ZEC, the NEAR
+        tokens in the wallet and the tokens deposited in intents.near. Each result is a
+        (symbol, chain, on_intent_contract, balance) tuple, with the exception as balance when its read failed.
+        """
+        held = assets is None
+        if held:
+            tokens = [token for chain in self._intent_contract.available_tokens
+                      for token in self._intent_contract.available_tokens[chain].values()]
+            assets = [("NEAR", "near", False), ("ZEC", "zec", False)]
+            assets += [(token.symbol, token.blockchain, False) for token in tokens if token.blockchain == "near"]
+            assets += [(token.symbol, token.blockchain, True) for token in tokens]
+
+        reads = {}
+        sources = []
+        intent_tokens = []
+        for asset_symbol, asset_chain, on_intent_contract in assets:
+            try:
+                if asset_symbol == "NEAR":
+                    if on_intent_contract:
+                        raise ValueError("only wNEAR exists in intents.near")
+                    sources.append(("near",))
+                    reads["near",] = self._near_balance
+                    continue
+                asset: AvailableToken = self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
+            except ValueError as e:
+                sources.append(e)
+                continue
+            if on_intent_contract:
+                sources.append(("intents", asset.defuse_asset_id))
+                intent_tokens.append(asset)
+            elif asset.symbol == "ZEC":
+                sources.append(("zec",))
+                # deferred to the read, so a wallet that fails to build only fails the ZEC balance
+                reads["zec",] = lambda: self._zec_balance()
+            else:
+                sources.append(("ft", asset.defuse_asset_id))
+                reads["ft", asset.defuse_asset_id] = lambda asset=asset: self._token_balance(asset)
+        if intent_tokens:
+            reads["intents",] = lambda: self._intent_balances(intent_tokens)
+
+        def read(key):
+            try:
+                return reads[key]()
+            except Exception as e:
+                return e
+
+        keys = list(reads)
+        values = {}
+        if keys:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+                values = dict(zip(keys, executor.map(read, keys)))
+
+        results = []
+        for (asset_symbol, asset_chain, on_intent_contract), source in zip(assets, sources):
+            if isinstance(source, Exception):
+                balance = source
+            elif source[0] == "intents":
+                deposited = values["intents",]
+                balance = deposited if isinstance(deposited, Exception) else deposited.get(source[1], 0.0)
+            else:
+                balance = values[source]
+            native = asset_symbol in ("NEAR", "ZEC") and not on_intent_contract
+            if held and not native and not isinstance(balance, Exception) and not balance:
+                continue
+            results.append((asset_symbol, asset_chain, on_intent_contract, balance))
+        return results
 
     def get_best_quote(self, asset_in_symbol: str, asset_in_chain: str, asset_out_symbol: str, asset_out_chain: str, amount_in: float) -> tuple[str,float, str, dict]:
         asset_in: AvailableToken = self._intent_contract.get_token(symbol=asset_in_symbol, chain=asset_in_chain)
         asset_out: AvailableToken =self._intent_contract.get_token(symbol=asset_out_symbol, chain=asset_out_chain)
         return self._solver.get_best_quote(asset_in, asset_out, amount_in)
     
-    def swap(self, asset_in_symbol: str, asset_in_chain: str, asset_out_symbol: str, asset_out_chain: str, amount_in: float) -> tuple:
+    def get_best_quotes(self, pairs: List[tuple]) -> list:
+        results = [None] * len(pairs)
+        quote_requests, positions = [], []
+        for index, (asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in) in enumerate(pairs):
+            try:
+                asset_in: AvailableToken = self._intent_contract.get_token(symbol=asset_in_symbol, chain=asset_in_chain)
+                asset_out: AvailableToken = self._intent_contract.get_token(symbol=asset_out_symbol, chain=asset_out_chain)
+            except ValueError as e:
+                results[index] = e
+                continue
+            quote_requests.append((asset_in, asset_out, amount_in))
+            positions.append(index)
+        for index, result in zip(positions, self._solver.get_best_quotes(quote_requests)):
+            results[index] = result
+        return results
+
+    def _prepare_swap(self, deposited: dict, asset_in_symbol: str, asset_in_chain: str, asset_out_symbol: str, asset_out_chain: str, amount_in: float) -> tuple[dict, float]:
+        """Checks a swap against the deposited balances, which are updated with its outcome, and quotes it."""
         asset_in: AvailableToken = self._intent_contract.get_token(symbol=asset_in_symbol, chain=asset_in_chain)
         asset_out: AvailableToken =self._intent_contract.get_token(symbol=asset_out_symbol, chain=asset_out_chain)
-        asset_in_balance = self.get_balance(asset_symbol=asset_in.symbol, asset_chain=asset_in_chain, on_intent_contract=True)
+        if asset_in.symbol == "NEAR":
+            raise ValueError("only wNEAR exists in intents.near")
+        asset_in_balance = deposited.get(asset_in.defuse_asset_id)
+        if not asset_in_balance:
+            raise ValueError(f"{asset_in.symbol} has not been deposited yet")
         if asset_in_balance < amount_in:
             raise ValueError(f"{self._near_account.account_id} has not enough {asset_in_symbol} balance")
-        _, amount_out, _, best_quote = self.get_best_quote(asset_in.symbol, asset_in_chain, asset_out.symbol, asset_out.blockchain, amount_in=amount_in)
-        signed_intent = self._near_account.sign_swap(best_quote)
-        intent_hash = self._solver.publish_intent(signed_intent)
-        status, tx_hash = self._solver.wait_for_intent_confirmed(intent_hash=intent_hash) 
-        if not tx_hash:
-            raise RuntimeError(f"swap of {amount_in} {asset_in.symbol} to {asset_out.symbol} resulted in {status}")
-        return status, intent_hash, tx_hash, amount_out
-    
-    def withdraw(self, asset_symbol: str, asset_chain: str, amount: float, native_dest_address: str = None) -> tuple:
-        deposited = self.get_deposited_tokens()
+        # a fresh quote owned by this swap: a cached one may be shared with, or signed by, other swaps
+        _, amount_out, _, best_quote = self._solver.get_best_quote(asset_in, asset_out, amount_in, use_cache=False)
+        deposited[asset_in.defuse_asset_id] = asset_in_balance - amount_in
+        deposited[asset_out.defuse_asset_id] = deposited.get(asset_out.defuse_asset_id, 0.0) + amount_out
+        return best_quote, amount_out
+
+    def _prepare_withdraw(self, deposited: dict, asset_symbol: str, asset_chain: str, amount: float, native_dest_address: str = None) -> tuple[dict, Token]:
+        """Checks a withdrawal against the deposited balances, which are updated with its outcome, and builds its intent."""
         if asset_chain == "near":
             symbol = asset_symbol
             if symbol == "NEAR":
                 # The user wants to execute a native_withdraw
                 symbol = "wNEAR" # We check the balance in wNEAR
-            asset: AvailableToken =self._intent_contract.get_token(symbol=symbol, chain=asset_chain)
-            asset_balance = deposited.get(asset.defuse_asset_id)
+            asset: AvailableToken = self._get_token(symbol=symbol, chain=asset_chain)
+            asset_id = asset.defuse_asset_id
         else:
-            asset: BridgeableToken = self._omni_bridge.get_token(symbol=asset_symbol, chain=asset_chain)
-            asset_balance = deposited.get(asset.get_asset_id())
+            asset: BridgeableToken = self._get_token(symbol=asset_symbol, chain=asset_chain)
+            asset_id = asset.get_asset_id()
             if not native_dest_address:
                 if asset.symbol == "ZEC":
                     native_dest_address = self._zec_wallet.get_address(shielded=False)
@@ -98,6 +351,7 @@ class Agent:
             min_withdraw = asset.min_withdrawal_amount / 10 ** asset.decimals
             if amount < min_withdraw:
                 raise ValueError(f"can not withdraw such small amount of {asset.symbol}, min {min_withdraw}")
+        asset_balance = deposited.get(asset_id)
             
         if not asset_balance:
             raise ValueError(f"{asset_symbol} has not been deposited yet")
@@ -105,57 +359,239 @@ class Agent:
             raise ValueError(f"{self._near_account.account_id} has not enough {asset_symbol} balance on {self._intent_contract.contract_id}")   
         if asset_symbol == "NEAR":
             # To perform a native_withdraw, we need to restore the symbol in NEAR
+            # on a copy, the catalog token is shared across agents
+            asset = copy.copy(asset)
             asset.symbol = "NEAR"
-        signed_intent = self._near_account.sign_withdraw(asset, amount, native_dest_address)
+        intent = self._near_account.build_withdraw_intent(asset, amount, native_dest_address)
+        deposited[asset_id] = asset_balance - amount
+        return intent, asset
+
+    def _publish(self, signed_intent: dict, invalidated: list, finish: Callable) -> Future:
+        """Publishes a signed intent without waiting for it to settle.
+
+        Returns a future resolved with finish(status, intent_hash, tx_hash) once it settles, after the
+        `invalidated` balances are invalidated again. It is resolved by the intent tracker thread.
+        """
+        self._components["public_key_registration"].get()
         intent_hash = self._solver.publish_intent(signed_intent)
-        status, tx_hash = self._solver.wait_for_intent_confirmed(intent_hash=intent_hash) 
-        if not tx_hash:
-            raise RuntimeError(f"withdraw of {amount} {asset.symbol} resulted in {status}")
-        tx_chain = "near"
-        # TODO wait tx confirmed and then shield it up
-        # if asset.symbol == "ZEC":
-        #     if native_dest_address in self._zec_wallet._addresses.get('t_addresses'):
-        #         # Auto shield tx
-        #         ua_address = self._zec_wallet.get_address(shielded=True)
-        #         tx_hash = self._zec_wallet.shield(to=ua_address)
-        #         tx_chain = "zec"
-        return status, intent_hash, tx_hash, tx_chain
+        settlement = self._solver.track_intent(intent_hash)
+        settlement.add_done_callback(lambda _: self._invalidate(invalidated))
+        return then(settlement, lambda outcome: finish(outcome[0], intent_hash, outcome[1]))
+
+    def swap(self, asset_in_symbol: str, asset_in_chain: str, asset_out_symbol: str, asset_out_chain: str, amount_in: float) -> tuple:
+        return self.start_swap(asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in).result()
+
+    def start_swap(self, asset_in_symbol: str, asset_in_chain: str, asset_out_symbol: str, asset_out_chain: str, amount_in: float) -> Future:
+        """Signs and publishes a swap, returning a future resolved with the `swap` result once it settles."""
+        def finish(status, intent_hash, tx_hash):
+            if not tx_hash:
+                raise RuntimeError(f"swap of {amount_in} {asset_in_symbol} to {asset_out_symbol} resulted in {status}")
+            return status, intent_hash, tx_hash, amount_out
+
+        with self._invalidates(INTENTS_BALANCE) as invalidated:
+            best_quote, amount_out = self._prepare_swap(self.get_deposited_tokens(), asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in)
+            signed_intent = self._near_account.sign_swap(best_quote)
+            return self._publish(signed_intent, invalidated, finish)
+    
+    @staticmethod
+    def _withdrawn_balances(asset: Token) -> list:
+        """The balances, besides the intents ones, receiving a withdrawal of `asset`."""
+        if asset.blockchain == "near":
+            # storage registrations and native withdrawals change the NEAR balance too
+            return [NEAR_BALANCE, (FT_BALANCE, asset.defuse_asset_id)]
+        if asset.symbol == "ZEC":
+            return [ZEC_BALANCE]
+        return []
+
+    def withdraw(self, asset_symbol: str, asset_chain: str, amount: float, native_dest_address: str = None) -> tuple:
+        return self.start_withdraw(asset_symbol, asset_chain, amount, native_dest_address).result()
+
+    def start_withdraw(self, asset_symbol: str, asset_chain: str, amount: float, native_dest_address: str = None) -> Future:
+        """Signs and publishes a withdrawal, returning a future resolved with the `withdraw` result once it settles."""
+        def finish(status, intent_hash, tx_hash):
+            if not tx_hash:
+                raise RuntimeError(f"withdraw of {amount} {asset.symbol} resulted in {status}")
+            tx_chain = "near"
+            # TODO wait tx confirmed and then shield it up
+            # if asset.symbol == "ZEC":
+            #     if native_dest_address in self._zec_wallet._addresses.get('t_addresses'):
+            #         # Auto shield tx
+            #         ua_address = self._zec_wallet.get_address(shielded=True)
+            #         tx_hash = self._zec_wallet.shield(to=ua_address)
+            #         tx_chain = "zec"
+            return status, intent_hash, tx_hash, tx_chain
+
+        with self._invalidates(INTENTS_BALANCE) as invalidated:
+            intent, asset = self._prepare_withdraw(self.get_deposited_tokens(), asset_symbol, asset_chain, amount, native_dest_address)
+            invalidated.extend(self._withdrawn_balances(asset))
+            signed_intent = self._near_account.sign_intents([intent], generate_deadline())
+            return self._publish(signed_intent, invalidated, finish)
+
+    def bundle(self, operations: List[tuple[str, dict]]) -> tuple[str, str, str, list]:
+        """Signs and publishes several swaps and withdrawals as a single intent.
+
+        Each operation is a ("swap" | "withdraw", params) pair, with the params of the
+        corresponding method. Later operations may spend the output of earlier ones.
+        Returns the status, intent hash and tx hash of the bundle together with the
+        per-operation details ({"amount_out": float} or {"chain": str}).
+        """
+        return self.start_bundle(operations).result()
+
+    def start_bundle(self, operations: List[tuple[str, dict]]) -> Future:
+        """Signs and publishes a bundle, returning a future resolved with the `bundle` result once it settles."""
+        def finish(status, intent_hash, tx_hash):
+            if not tx_hash:
+                raise RuntimeError(f"bundle of {len(intents)} intents resulted in {status}")
+            return status, intent_hash, tx_hash, details
+
+        with self._invalidates(INTENTS_BALANCE) as invalidated:
+            deposited = self.get_deposited_tokens()
+            intents, quote_hashes, deadlines, details = [], [], [], []
+            for command, params in operations:
+                if command == "swap":
+                    best_quote, amount_out = self._prepare_swap(deposited, **params)
+                    intents.append(self._near_account.build_swap_intent(best_quote))
+                    quote_hashes.append(best_quote["quote_hash"])
+                    deadlines.append(best_quote["expiration_time"])
+                    details.append({"amount_out": amount_out})
+                elif command == "withdraw":
+                    intent, asset = self._prepare_withdraw(deposited, **params)
+                    invalidated.extend(self._withdrawn_balances(asset))
+                    intents.append(intent)
+                    deadlines.append(generate_deadline())
+                    details.append({"chain": "near"})
+                else:
+                    raise ValueError(f"{command} can not be bundled, only swap and withdraw can")
+            if not intents:
+                raise ValueError("nothing to bundle")
+            deadline = min(deadlines, key=lambda d: parse_expiration_time(d) or float("inf"))
+            signed_intent = self._near_account.sign_intents(intents, deadline, quote_hashes)
+            return self._publish(signed_intent, invalidated, finish)
     
     def deposit(self, asset_symbol: str, asset_chain: str, amount: float) -> str:
-        if asset_symbol == "NEAR":
-            return self._intent_contract.deposit_near(amount=amount, account=self._near_account)          
-        elif asset_symbol == "ZEC":
-            asset: BridgeableToken = self._omni_bridge.get_token(symbol=asset_symbol, chain=asset_chain)
-            min_deposit = asset.min_deposit_amount / 10 ** asset.decimals
-            if amount < min_deposit:
-                raise ValueError(f"can not deposit such small amount, min {min_deposit}")
-            asset_balance = self._zec_wallet.get_balance()
-            if asset_balance < min_deposit:
-                raise ValueError(f"not enough ZEC balance, you have {asset_balance} and you want to send {amount}")
-            deposit_address = self._omni_bridge.get_deposit_address(token=asset, account_id=self._near_account.account_id)
-            tx_hash = self.send(asset_symbol=asset.symbol, asset_chain=asset.blockchain, to_address=deposit_address, amount=amount)
-            self._zec_wallet.wait_tx_confirmed(tx_hash=tx_hash)
-            return tx_hash
-        elif asset_chain == "near":
-            asset: AvailableToken = self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
-            if asset.balance_of(account=self._near_account) < amount:
-                raise ValueError('not enough balance')
-            return self._intent_contract.deposit(asset=asset, amount=amount, account=self._near_account)
-        else:
-            raise NotImplementedError("deposit for non-NEAR assets aside ZEC has not been implemented yet, you can do it manually on https://app.near-intents.org/")
+        with self._invalidates(INTENTS_BALANCE) as invalidated:
+            if asset_symbol == "NEAR":
+                invalidated.append(NEAR_BALANCE)
+                return self._intent_contract.deposit_near(amount=amount, account=self._near_account)
+            elif asset_symbol == "ZEC":
+                asset: BridgeableToken = self._get_token(symbol=asset_symbol, chain=asset_chain)
+                min_deposit = asset.min_deposit_amount / 10 ** asset.decimals
+                if amount < min_deposit:
+                    raise ValueError(f"can not deposit such small amount, min {min_deposit}")
+                asset_balance = self._zec_balance()
+                if asset_balance < min_deposit:
+                    raise ValueError(f"not enough ZEC balance, you have {asset_balance} and you want to send {amount}")
+                deposit_address = self._omni_bridge.get_deposit_address(token=asset, account_id=self._near_account.account_id)
+                tx_hash = self.send(asset_symbol=asset.symbol, asset_chain=asset.blockchain, to_address=deposit_address, amount=amount)
+                self._zec_wallet.wait_tx_confirmed(tx_hash=tx_hash)
+                return tx_hash
+            elif asset_chain == "near":
+                asset: AvailableToken = self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
+                if self._token_balance(asset) < amount:
+                    raise ValueError('not enough balance')
+                invalidated.extend([NEAR_BALANCE, (FT_BALANCE, asset.defuse_asset_id)])
+                return self._intent_contract.deposit(asset=asset, amount=amount, account=self._near_account)
+            else:
+                raise NotImplementedError("deposit for non-NEAR assets aside ZEC has not been implemented yet, you can do it manually on https://app.near-intents.org/")
         
     def send(self, asset_symbol: str, asset_chain: str, to_address: str, amount: float) -> str:
-        if asset_symbol == "NEAR":
-            return self._near_account.send_near(target_account_id=to_address, amount=amount)
-        asset: AvailableToken =self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
-        if asset.symbol == "ZEC":
-            balance = self._zec_wallet.get_balance()
-            fees = self._zec_wallet.default_fee()
-            if balance < amount + fees:
-                raise ValueError(f"not enough balance, you are trying to send {amount} + {fees} of fee but your spendable balance is {balance}")
-            return self._zec_wallet.send(to=to_address, value=amount)
-        else:
-            balance = asset.balance_of(account=self._near_account)
-            if balance < amount:
-                raise ValueError("not enough balance")
-            return self._near_account.send(asset=asset, to_account_id=to_address, amount=amount)
\ No newline at end of file
+        with self._invalidates() as invalidated:
+            if asset_symbol == "NEAR":
+                invalidated.append(NEAR_BALANCE)
+                return self._near_account.send_near(target_account_id=to_address, amount=amount)
+            asset: AvailableToken =self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
+            if asset.symbol == "ZEC":
+                balance = self._zec_balance()
+                fees = self._zec_wallet.default_fee()
+                if balance < amount + fees:
+                    raise ValueError(f"not enough balance, you are trying to send {amount} + {fees} of fee but your spendable balance is {balance}")
+                invalidated.append(ZEC_BALANCE)
+                return self._zec_wallet.send(to=to_address, value=amount)
+            else:
+                balance = self._token_balance(asset)
+                if balance < amount:
+                    raise ValueError("not enough balance")
+                invalidated.extend([NEAR_BALANCE, (FT_BALANCE, asset.defuse_asset_id)])
+                return self._near_account.send(asset=asset, to_account_id=to_address, amount=amount)
+
+    def send_many(self, transfers: List[tuple], ft_transfer_gas: int = FT_TRANSFER_GAS) -> list:
+        """Sends many (symbol, chain, to_address, amount) transfers with as few transactions as possible.
+
+        NEAR token transfers are packed into multi-action transactions per token contract, native NEAR
+        transfers are broadcast concurrently and ZEC transfers share one multi-recipient transaction,
+        sent while the NEAR ones execute. The balance of each asset must cover all of its transfers, and
+        the NEAR balance also the storage deposits and prepaid gas of the NEAR transactions.
+        Returns, for each transfer in order, its tx hash or the exception that failed it.
+        """
+        results = [None] * len(transfers)
+        near_transfers, near_indexes, zec_indexes = [], [], []
+        for index, (asset_symbol, asset_chain, to_address, amount) in enumerate(transfers):
+            try:
+                if amount <= 0:
+                    raise ValueError("amount must be greater than 0")
+                asset = None if asset_symbol == "NEAR" else self._intent_contract.get_token(symbol=asset_symbol, chain=asset_chain)
+            except ValueError as e:
+                results[index] = e
+                continue
+            if asset is not None and asset.symbol == "ZEC":
+                zec_indexes.append(index)
+            else:
+                near_transfers.append((asset, to_address, amount))
+                near_indexes.append(index)
+
+        totals = {}
+        for index in near_indexes + zec_indexes:
+            asset_symbol, asset_chain = transfers[index][:2]
+            if asset_symbol != "NEAR":
+                totals.setdefault((asset_symbol, asset_chain), []).append(index)
+        balances = self.get_balances([(asset_symbol, asset_chain, False) for asset_symbol, asset_chain in totals])
+        fees = self._zec_wallet.default_fee() if zec_indexes else 0.0
+        for (asset_symbol, asset_chain, _, balance), indexes in zip(balances, totals.values()):
+            amount = sum(transfers[index][3] for index in indexes)
+            if asset_symbol == "ZEC":
+                amount += fees
+            if isinstance(balance, Exception):
+                error = balance
+            elif balance < amount:
+                error = ValueError(f"not enough {asset_symbol} balance, you are trying to send {amount} but your balance is {balance}")
+            else:
+                continue
+            for index in indexes:
+                results[index] = error
+
+        zec_indexes = [index for index in zec_indexes if results[index] is None]
+        pending = [(index, transfer) for index, transfer in zip(near_indexes, near_transfers) if results[index] is None]
+        batches = None
+        if pending:
+            # Native amounts, storage deposits and prepaid gas are all paid from the NEAR balance
+            try:
+                batches = self._near_account.plan_many([transfer for _, transfer in pending], ft_transfer_gas=ft_transfer_gas)
+                amount = sum(batch[4] for batch in batches) / 10 ** 24
+                balance = self._near_balance()
+                if balance < amount:
+                    raise ValueError(f"not enough NEAR balance, you are trying to send {amount} including storage deposits and gas but your balance is {balance}")
+            except Exception as e:
+                for index, _ in pending:
+                    results[index] = e
+                pending = []
+        invalidated = [ZEC_BALANCE] if zec_indexes else []
+        if pending:
+            invalidated.append(NEAR_BALANCE)
+            invalidated.extend({(FT_BALANCE, asset.defuse_asset_id) for _, (asset, _, _) in pending if asset is not None})
+        with self._invalidates(*invalidated):
+            zec_future = None
+            if zec_indexes:
+                zec_future = _run_in_background(self._zec_wallet.send_many, [transfers[index][2:] for index in zec_indexes])
+            if pending:
+                near_results = self._near_account.send_many([transfer for _, transfer in pending], batches=batches)
+                for (index, _), tx_hash in zip(pending, near_results):
+                    results[index] = tx_hash
+            if zec_future is not None:
+                try:
+                    tx_hash = zec_future.result()
+                except Exception as e:
+                    tx_hash = e
+                for index in zec_indexes:
+                    results[index] = tx_hash
+        return results
+
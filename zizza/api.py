@@ -5,40 +5,72 @@ This module defines the `API` class, which acts as a wrapper around the `Agent`
 It provides various methods for managing cryptocurrency operations such as deposits, withdrawals, swaps, and balance checks.
 
 """
+from concurrent.futures import Future
 from .agent import Agent
+from .executor import then
 from .middleware import *
+from .registry import AgentRegistry, DEFAULT_SESSION
 
 class API:
     """
     A class that interfaces with the Agent to facilitate cryptocurrency operations.
     """
     
-    def __init__(self):
+    def __init__(self, registry: AgentRegistry = None, session_id: str = DEFAULT_SESSION):
         """
-        Initializes the API instance with no agent set.
+        Initializes the API instance bound to a session of an agent registry.
+        
+        Args:
+            registry (AgentRegistry, optional): The registry holding the agents, by default a private
+                registry holding a single agent that never expires.
+            session_id (str): The session whose agent this instance operates on.
         """
-        self.agent = None
+        self.registry = registry if registry is not None else AgentRegistry(max_agents=1, idle_timeout=None)
+        self.session_id = session_id
+
+    @property
+    def agent(self) -> Agent:
+        return self.registry.get(self.session_id)
 
-    def set_agent(self, near_account_id: str, near_ed25519_key: str, zec_mnemonics: str, zec_wallet_birthday: int) -> dict:
+    @agent.setter
+    def agent(self, agent: Agent):
+        self.registry.put(self.session_id, agent)
+
+    def for_session(self, session_id: str) -> "API":
+        """
+        Returns an API instance bound to another session of the same registry.
+        """
+        return API(registry=self.registry, session_id=session_id)
+
+    @normalize_boolean_params
+    def set_agent(self, near_account_id: str, near_ed25519_key: str, zec_mnemonics: str, zec_wallet_birthday: int, eager: bool = False) -> dict:
         """
         Initializes and sets the Agent instance with the provided credentials.
         
+        The agent components (Zcash wallet, NEAR account, token catalogs) are built on first use.
+        With `eager` they are all built concurrently before returning, and the Zcash wallet
+        summary is included in the response.
+        
         Args:
             near_account_id (str): The NEAR account ID.
             near_ed25519_key (str): The NEAR Ed25519 private key.
             zec_mnemonics (str): The mnemonic phrase for the Zcash wallet.
             zec_wallet_birthday (int): The birthday height of the Zcash wallet.
+            eager (bool): Whether to build every component right away.
         
         Returns:
             dict: Wallet information containing:
-                - "ZEC":
+                - "ZEC" (only with eager):
                     - "ua_addresses": {"address": str, "balance": float}
                     - "z_addresses": list[dict{"address": str, "balance": float}]
                     - "t_addresses": list[dict{"address": str, "balance": float}]
                 - "NEAR": {"address": str, "balance": float}
+                - "startup_timings": dict[str, float] Seconds spent building each component so far.
         """
-        self.agent = Agent(near_account_id, near_ed25519_key, zec_mnemonics, zec_wallet_birthday)
-        return self.agent.get_wallet_summary()
+        agent = Agent(near_account_id, near_ed25519_key, zec_mnemonics, zec_wallet_birthday, eager=eager)
+        self.agent = agent
+        summary = agent.get_wallet_summary() if eager else {"NEAR": agent.get_account_balance()}
+        return {**summary, "startup_timings": dict(agent.startup_timings)}
     
     @is_agent_set
     def get_wallet_summary(self) -> dict:
@@ -68,6 +100,36 @@ class API:
         """
         return {"balance": self.agent.get_balance(asset_symbol, asset_chain, on_intent_contract)}
     
+    @is_agent_set
+    def get_balances(self, assets: list[dict] = None) -> dict[list[dict]]:
+        """
+        Retrieves the balances of many assets in one call, reading each source once and concurrently.
+        
+        Args:
+            assets (list[dict], optional): The balances to fetch, each with the `get_balance` parameters
+                (asset_symbol, asset_chain, on_intent_contract, which defaults to false). By default every
+                held asset is returned: NEAR, ZEC and the non-zero NEAR token and intents.near balances.
+        
+        Returns:
+            dict: {"balances": list[dict]} For each balance, in order,
+                {"asset_symbol": str, "asset_chain": str, "on_intent_contract": bool} with either
+                "balance": float or "error": str. Assets never deposited in intents.near have a zero balance.
+        """
+        requested = None
+        if assets is not None:
+            requested = []
+            for asset in map(normalize_params, assets):
+                requested.append((asset["asset_symbol"], asset["asset_chain"], asset.get("on_intent_contract", False)))
+        balances = []
+        for asset_symbol, asset_chain, on_intent_contract, balance in self.agent.get_balances(requested):
+            entry = {"asset_symbol": asset_symbol, "asset_chain": asset_chain, "on_intent_contract": on_intent_contract}
+            if isinstance(balance, Exception):
+                entry["error"] = str(balance)
+            else:
+                entry["balance"] = balance
+            balances.append(entry)
+        return {"balances": balances}
+    
     @is_agent_set
     @normalize_chain_params
     def get_token_price(self, asset_symbol: str, asset_chain: str) -> dict[float, str]:
@@ -79,10 +141,11 @@ class API:
             asset_chain (str): The blockchain where the asset is stored.
         
         Returns:
-            dict: {"usd_price", float, "price_updated_at", str } The price of the specified asset.
+            dict: {"usd_price": float, "price_updated_at": str, "catalog_age": float} The price of the specified asset
+                and how many seconds ago the cached token catalog was last refreshed.
         """
-        usd_price, price_updated_at = self.agent.get_token_price(asset_symbol=asset_symbol, asset_chain=asset_chain)
-        return {"usd_price", usd_price, "price_updated_at", price_updated_at}
+        usd_price, price_updated_at, catalog_age = self.agent.get_token_price(asset_symbol=asset_symbol, asset_chain=asset_chain)
+        return {"usd_price": usd_price, "price_updated_at": price_updated_at, "catalog_age": catalog_age}
     
     @is_agent_set
     @normalize_chain_params
@@ -104,6 +167,32 @@ class API:
         quote_hash, amount_out, expiration_time, _ = self.agent.get_best_quote(asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in)
         return {"quote_hash": quote_hash, "amount_out": amount_out, "expiration_time": expiration_time}
     
+    @is_agent_set
+    def get_best_quotes(self, quotes: list[dict]) -> dict[list[dict]]:
+        """
+        Retrieves the best swap quotes of many asset pairs and amounts concurrently.
+        
+        Args:
+            quotes (list[dict]): The quotes to fetch, each with the `get_best_quote` parameters
+                (asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in).
+        
+        Returns:
+            dict: {"quotes": list[dict]} For each requested quote, in order, either
+                {"quote_hash": str, "amount_out": float, "expiration_time": str} or {"error": str}.
+        """
+        pairs = []
+        for quote in map(normalize_params, quotes):
+            pairs.append((quote["asset_in_symbol"], quote["asset_in_chain"], quote["asset_out_symbol"],
+                          quote["asset_out_chain"], quote["amount_in"]))
+        results = []
+        for result in self.agent.get_best_quotes(pairs):
+            if isinstance(result, Exception):
+                results.append({"error": str(result)})
+            else:
+                quote_hash, amount_out, expiration_time, _ = result
+                results.append({"quote_hash": quote_hash, "amount_out": amount_out, "expiration_time": expiration_time})
+        return {"quotes": results}
+
     @is_agent_set
     def get_chains(self) -> dict[list[str]]:
         """
@@ -176,8 +265,20 @@ class API:
         Returns:
             dict: {"status": str, "intent_hash": str, "tx_hash": str, "amount_out": float} Swap details.
         """
-        status, intent_hash, tx_hash, amount_out = self.agent.swap(asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in)
-        return {"status": status, "intent_hash": intent_hash, "tx_hash": tx_hash, "amount_out": amount_out}
+        return self.start_swap(asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in).result()
+
+    @is_agent_set
+    @normalize_chain_params
+    @normalize_amount_params
+    def start_swap(self, asset_in_symbol: str, asset_in_chain: str, asset_out_symbol: str, asset_out_chain: str, amount_in: float) -> Future:
+        """
+        Signs and publishes a swap without waiting for it to settle.
+        
+        Returns:
+            Future: Resolved with the `swap` details once the swap settles.
+        """
+        settlement = self.agent.start_swap(asset_in_symbol, asset_in_chain, asset_out_symbol, asset_out_chain, amount_in)
+        return then(settlement, lambda outcome: dict(zip(("status", "intent_hash", "tx_hash", "amount_out"), outcome)))
 
     @is_agent_set
     @normalize_chain_params
@@ -195,8 +296,53 @@ class API:
         Returns:
             dict: {"status": str, "intent_hash": str, "tx_hash": str, "chain": str} Withdrawal details.
         """
-        status, intent_hash, tx_hash, chain = self.agent.withdraw(asset_symbol, asset_chain, amount, native_dest_address)
-        return {"status": status, "intent_hash": intent_hash, "tx_hash": tx_hash, "chain": chain}
+        return self.start_withdraw(asset_symbol, asset_chain, amount, native_dest_address).result()
+
+    @is_agent_set
+    @normalize_chain_params
+    @normalize_amount_params
+    def start_withdraw(self, asset_symbol: str, asset_chain: str, amount: float, native_dest_address=None) -> Future:
+        """
+        Signs and publishes a withdrawal without waiting for it to settle.
+        
+        Returns:
+            Future: Resolved with the `withdraw` details once the withdrawal settles.
+        """
+        settlement = self.agent.start_withdraw(asset_symbol, asset_chain, amount, native_dest_address)
+        return then(settlement, lambda outcome: dict(zip(("status", "intent_hash", "tx_hash", "chain"), outcome)))
+
+    @is_agent_set
+    def bundle(self, operations: list[dict]) -> dict:
+        """
+        Signs and publishes several swaps and withdrawals as a single intent, with one signature,
+        one publish and one settlement wait. The operations settle atomically, and later ones may
+        spend the output of earlier ones (e.g. a swap followed by a withdrawal of the swapped asset).
+        
+        Args:
+            operations (list[dict]): The operations to bundle, each {"command": "swap" | "withdraw", "params": dict}
+                with the parameters of the corresponding method.
+        
+        Returns:
+            dict: {"status": str, "intent_hash": str, "tx_hash": str, "results": list[dict]} Bundle details,
+                with the swap or withdraw response of each operation in order.
+        """
+        return self.start_bundle(operations).result()
+
+    @is_agent_set
+    def start_bundle(self, operations: list[dict]) -> Future:
+        """
+        Signs and publishes a bundle without waiting for it to settle.
+        
+        Returns:
+            Future: Resolved with the `bundle` details once the bundle settles.
+        """
+        def summarize(outcome):
+            status, intent_hash, tx_hash, details = outcome
+            results = [{"status": status, "intent_hash": intent_hash, "tx_hash": tx_hash, **detail} for detail in details]
+            return {"status": status, "intent_hash": intent_hash, "tx_hash": tx_hash, "results": results}
+
+        parsed = [(operation.get("command"), normalize_params(operation.get("params", {}))) for operation in operations]
+        return then(self.agent.start_bundle(parsed), summarize)
 
     @is_agent_set
     @normalize_chain_params
@@ -216,3 +362,30 @@ class API:
         """
         tx_hash = self.agent.send(asset_symbol, asset_chain, to_address, amount)
         return {"tx_hash": tx_hash, "chain": asset_chain}
+
+    @is_agent_set
+    def send_many(self, transfers: list[dict]) -> dict[list[dict]]:
+        """
+        Sends many assets in as few transactions as possible. The NEAR token transfers of each
+        token contract share multi-action transactions, with the storage deposits of the recipients
+        that need one, and the ZEC transfers share a single multi-recipient transaction. A failed
+        transaction fails all of the transfers it carries.
+        
+        Args:
+            transfers (list[dict]): The transfers, each with the `send` parameters
+                (asset_symbol, asset_chain, to_address, amount).
+        
+        Returns:
+            dict: {"transfers": list[dict]} For each transfer, in order, either
+                {"tx_hash": str, "chain": str} or {"error": str}.
+        """
+        requested = []
+        for transfer in map(normalize_params, transfers):
+            requested.append((transfer["asset_symbol"], transfer["asset_chain"], transfer["to_address"], transfer["amount"]))
+        results = []
+        for (_, asset_chain, _, _), tx_hash in zip(requested, self.agent.send_many(requested)):
+            if isinstance(tx_hash, Exception):
+                results.append({"error": str(tx_hash)})
+            else:
+                results.append({"tx_hash": tx_hash, "chain": asset_chain})
+        return {"transfers": results}
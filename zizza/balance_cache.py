@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable
+
+NEAR_BALANCE = "near"
+INTENTS_BALANCE = "intents"
+FT_BALANCE = "ft"
+ZEC_BALANCE = "zec"
+
+# Seconds a balance read is reused, per source
+BALANCE_TTLS = {
+    NEAR_BALANCE: 5,
+    INTENTS_BALANCE: 5,
+    FT_BALANCE: 5,
+    ZEC_BALANCE: 15,
+}
+
+
+class BalanceCache:
+    """Short-lived snapshots of an agent's balances, per source (NEAR account, intents contract,
+    token contracts, Zcash wallet).
+
+    Entries are (source, key) pairs reused for the TTL of their source, and invalidated by the agent
+    after each operation changing them. A read that was in flight when its source was invalidated is
+    returned to its caller but not cached, so an invalidation is never undone by an older read.
+    """
+
+    def __init__(self, ttls: Dict[str, float] = None):
+        self.ttls = {**BALANCE_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[tuple, tuple] = {}
+        self._generations: Dict[str, int] = {source: 0 for source in self.ttls}
+        self._lock = threading.Lock()
+
+    def get(self, source: str, key: Hashable, fetch: Callable):
+        """Returns the cached value of `key`, or the result of `fetch()`, which is cached."""
+        return self.get_many(source, [key], lambda keys: {key: fetch()})[key]
+
+    def get_many(self, source: str, keys: Iterable[Hashable], fetch: Callable) -> dict:
+        """Returns the values of `keys`, calling `fetch(missing_keys)` once for the ones not cached.
+
+        `fetch` returns a {key: value} mapping.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.monotonic()
+        values = {}
+        with self._lock:
+            generation = self._generations[source]
+            for key in keys:
+                entry = self._entries.get((source, key))
+                if entry and now - entry[1] < self.ttls[source]:
+                    values[key] = entry[0]
+            self.hits += len(values)
+            self.misses += len(keys) - len(values)
+        missing = [key for key in keys if key not in values]
+        if not missing:
+            return values
+        fetched = fetch(missing)
+        with self._lock:
+            if self._generations[source] == generation:
+                for key, value in fetched.items():
+                    self._entries[source, key] = (value, now)
+        values.update(fetched)
+        return values
+
+    def invalidate(self, source: str, *keys: Hashable):
+        """Drops the given keys of a source, or all of them without keys."""
+        with self._lock:
+            self._generations[source] += 1
+            if keys:
+                for key in keys:
+                    self._entries.pop((source, key), None)
+            else:
+                for entry in [entry for entry in self._entries if entry[0] == source]:
+                    del self._entries[entry]
+
+    def clear(self):
+        with self._lock:
+            for source in self._generations:
+                self._generations[source] += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
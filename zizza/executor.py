@@ -0,0 +1,204 @@
+"""
+Executor Module
+===============
+This module defines the `ExecutionEngine` class, a fixed-size worker pool fed by a bounded
+queue that runs the operation batches submitted to the server.
+
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+READ_ONLY_COMMANDS = frozenset({
+    "get_wallet_summary",
+    "get_balance",
+    "get_balances",
+    "get_token_price",
+    "get_best_quote",
+    "get_best_quotes",
+    "get_chains",
+    "get_tokens_by_chain",
+    "get_chains_by_token",
+})
+
+EXECUTION_WORKERS = 8
+EXECUTION_QUEUE_SIZE = 100
+READ_ONLY_CONCURRENCY = 8
+SIGNING_CONCURRENCY = 2
+
+logger = logging.getLogger(__name__)
+
+# The signing slots of the engine running the current operation, taken by `signing_slot`
+_signing_slots: ContextVar[Optional[threading.BoundedSemaphore]] = ContextVar("signing_slots", default=None)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def is_read_only(command: str) -> bool:
+    return command in READ_ONLY_COMMANDS
+
+
+def then(future: Future, func: Callable) -> Future:
+    """
+    Returns a future resolved with func(result) once `future` is done, or with the exception of either.
+    `func` runs in the thread completing `future`, so it must not block.
+    """
+    chained = Future()
+
+    def done(source: Future):
+        try:
+            chained.set_result(func(source.result()))
+        except BaseException as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(done)
+    return chained
+
+
+@contextmanager
+def signing_slot():
+    """
+    Holds a signing slot of the engine running the current operation while the block signs and
+    broadcasts a transaction or an intent. Waiting for its outcome must happen after the block, so
+    slow settlements and confirmations do not hold the slot. Nested blocks and code running
+    outside of an engine operation do not take a slot.
+    """
+    slots = _signing_slots.get()
+    if slots is None:
+        yield
+        return
+    with slots:
+        token = _signing_slots.set(None)
+        try:
+            yield
+        finally:
+            _signing_slots.reset(token)
+
+
+class ExecutionEngine:
+    """
+    Runs submitted batches on a fixed number of worker threads.
+
+    Batches wait in a bounded FIFO queue; `submit` raises `QueueFullError` once it is full.
+    A batch waiting for an outcome (e.g. an intent settlement) returns its worker and is
+    continued with `resume`, ahead of the batches not started yet. Read-only operations additionally hold a read-only slot while they run, and the other
+    operations hold a signing slot only while they sign and broadcast (see `signing_slot`),
+    so read-only queries and broadcasts have separate concurrency limits.
+    """
+
+    def __init__(self, handler: Callable[..., None], workers: int = EXECUTION_WORKERS,
+                 queue_size: int = EXECUTION_QUEUE_SIZE, read_only_concurrency: int = READ_ONLY_CONCURRENCY,
+                 signing_concurrency: int = SIGNING_CONCURRENCY):
+        """
+        Args:
+            handler (Callable): Called as handler(task_id, *args) by a worker for each submitted batch.
+            workers (int): The number of worker threads.
+            queue_size (int): The maximum number of batches waiting for a worker.
+            read_only_concurrency (int): The maximum number of read-only operations running at once.
+            signing_concurrency (int): The maximum number of transactions or intents being signed and broadcast at once.
+        """
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue = deque()
+        self._resumed = deque()
+        self._not_empty = threading.Condition()
+        self._read_only_slots = threading.BoundedSemaphore(read_only_concurrency)
+        self._signing_slots = threading.BoundedSemaphore(signing_concurrency)
+        self._threads = []
+        self._active = 0
+
+    def start(self):
+        """
+        Starts the worker threads, if not already running.
+        """
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"execution-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, task_id: str, *args) -> int:
+        """
+        Enqueues a batch, to be run as handler(task_id, *args).
+
+        Returns:
+            int: The 1-based position of the batch in the queue.
+
+        Raises:
+            QueueFullError: If the queue already holds `queue_size` batches.
+        """
+        with self._not_empty:
+            if len(self._queue) >= self.queue_size:
+                raise QueueFullError(f"execution queue is full ({self.queue_size} batches pending)")
+            self._queue.append((task_id, args))
+            self._not_empty.notify()
+            return len(self._queue)
+
+    def resume(self, task_id: str, func: Callable[..., None], *args):
+        """
+        Runs func(task_id, *args) on a worker to continue a started batch, ahead of the queued batches.
+        Never blocks nor fails on a full queue, so it can be called from a future callback.
+        """
+        with self._not_empty:
+            self._resumed.append((task_id, func, args))
+            self._not_empty.notify()
+
+    def queue_position(self, task_id: str) -> int:
+        """
+        Returns the 1-based position of a queued batch, or None if it is not waiting.
+        """
+        with self._not_empty:
+            for position, (queued_id, _) in enumerate(self._queue, start=1):
+                if queued_id == task_id:
+                    return position
+        return None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @contextmanager
+    def command_slot(self, command: str):
+        """
+        Runs an operation of `command`: read-only ones hold a read-only slot while the block runs,
+        the others may take a signing slot around their broadcasts with `signing_slot`.
+        """
+        if is_read_only(command):
+            with self._read_only_slots:
+                yield
+            return
+        token = _signing_slots.set(self._signing_slots)
+        try:
+            yield
+        finally:
+            _signing_slots.reset(token)
+
+    def _work(self):
+        while True:
+            with self._not_empty:
+                while not self._queue and not self._resumed:
+                    self._not_empty.wait()
+                if self._resumed:
+                    task_id, func, args = self._resumed.popleft()
+                else:
+                    (task_id, args), func = self._queue.popleft(), self.handler
+                self._active += 1
+            try:
+                func(task_id, *args)
+            except Exception:
+                logger.exception("unhandled error while executing task %s", task_id)
+            finally:
+                with self._not_empty:
+                    self._active -= 1
@@ -27,6 +27,8 @@ def normalize_chain_params(func):
     
     return wrapper
 
+BOOLEAN_PARAMS = ("eager",)
+
 def normalize_boolean_params(func):
     """
     Decorator that normalizes parameters by converting "true" to True and "false" to False.
@@ -37,7 +39,7 @@ def normalize_boolean_params(func):
     def wrapper(*args, **kwargs):
         new_kwargs = {
             key: (True if value.lower() == "true" else False if value.lower() == "false" else value)
-            if isinstance(value, str) and "on_" in key else value
+            if isinstance(value, str) and ("on_" in key or key in BOOLEAN_PARAMS) else value
             for key, value in kwargs.items()
         }
         return func(*args, **new_kwargs)
@@ -61,4 +63,16 @@ def normalize_amount_params(func):
                 new_kwargs[key] = value
         return func(*args, **new_kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+@normalize_chain_params
+@normalize_amount_params
+@normalize_boolean_params
+def _identity(**kwargs):
+    return kwargs
+
+def normalize_params(params: dict) -> dict:
+    """
+    Applies the chain, amount and boolean normalizations to a dict of parameters,
+    for commands receiving the parameters of other commands.
+    """
+    return _identity(**params)
@@ -1,37 +1,67 @@
 from .asset import AvailableToken, Token
 from .nep413_signer import serialize_intent
+from .provider import PooledJsonProvider
+from .registration_cache import RegistrationCache, get_public_key_cache, get_storage_cache
+from .tx_pipeline import get_tx_pipeline, invalid_tx_error
+from ..executor import signing_slot
+from ..metrics import track_backend
+from ..transport import HTTPTransport
 from datetime import datetime, timedelta, timezone
 import near_api
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+from near_api import transactions
+from near_api.account import ViewFunctionError, DEFAULT_ATTACHED_GAS
+import os
 import base58
 import base64
 import json
 import secrets
 
-NEAR_RPC_NODE_URL = 'https://rpc.mainnet.near.org'
+NEAR_RPC_NODE_URL = os.getenv('ZIZZA_NEAR_RPC_URL', 'https://rpc.mainnet.near.org')
 MAX_GAS = 300 * 10 ** 12
-
-def generate_nonce():
-    return base64.b64encode(secrets.token_bytes(32)).decode('utf-8')
-
+STORAGE_DEPOSIT_AMOUNT = 1250000000000000000000
+# Attached to each ft_transfer of a bulk transfer, MAX_GAS caps the gas of the actions of a transaction.
+# The gas unused is refunded but all of it must be paid up front, and less gas than the token contract
+# needs fails the whole transaction: a lower value packs more transfers per transaction (30 at 10 TGas,
+# 10 at 30 TGas) at the risk of running out of gas on contracts with costly transfer hooks.
+FT_TRANSFER_GAS = int(os.getenv("ZIZZA_FT_TRANSFER_TGAS", 30)) * 10 ** 12
+STORAGE_DEPOSIT_GAS = 10 * 10 ** 12
+# Upper bound of the gas burnt to send and convert a transaction and its actions, on top of attached gas
+TX_BASE_GAS = 5 * 10 ** 12
+# yoctoNEAR per gas unit reserved for prepaid gas: twice the protocol minimum, for congestion pricing
+GAS_PRICE = 2 * 10 ** 8
+# Protocol limit of actions in a single transaction
+MAX_ACTIONS_PER_TX = 100
+STORAGE_CHECK_MAX_WORKERS = 8
 
 def generate_deadline(minutes_from_now=1):
     return (datetime.now(timezone.utc) + timedelta(minutes=minutes_from_now)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
 
 
 class NEARAccount:
-    def __init__(self, account_id: str, prv_key: str, rpc_url=NEAR_RPC_NODE_URL):
-        self.provider = near_api.providers.JsonProvider(rpc_url)
+    def __init__(self, account_id: str, prv_key: str, rpc_url=NEAR_RPC_NODE_URL, transport: HTTPTransport = None,
+                 storage_cache: RegistrationCache = None, public_key_cache: RegistrationCache = None):
+        self.storage_cache = storage_cache if storage_cache is not None else get_storage_cache()
+        self.public_key_cache = public_key_cache if public_key_cache is not None else get_public_key_cache()
+        self.provider = PooledJsonProvider(rpc_url, transport=transport)
         key_pair = near_api.signer.KeyPair(prv_key)
         self.signer = near_api.signer.Signer(account_id, key_pair)
         self.account_id = account_id
-        self._account = near_api.account.Account(
-            self.provider, self.signer, self.account_id)
+        self.public_key = 'ed25519:' + \
+            base58.b58encode(self.signer.public_key).decode('utf-8')
+        # Nonces and block hashes are managed locally, shared by every account using this key
+        self._pipeline = get_tx_pipeline(self.provider, self.signer)
 
-    def function_call(self, *args, **kwargs):
+    def submit_transaction(self, receiver_id: str, actions: list) -> Future:
+        """Broadcasts a transaction without waiting for it, returning a future resolved with its outcome."""
         try:
-            return self._account.function_call(*args, **kwargs)
+            with signing_slot():
+                return self._pipeline.submit(receiver_id, actions)
         except Exception as e:
-            error = e.args[0]['data']['TxExecutionError']['InvalidTxError']['NotEnoughBalance']
+            error = (invalid_tx_error(e) or {}).get('NotEnoughBalance')
+            if not error:
+                raise
             error_str = "{} has {} yoctaNEAR, not enough to cover the tx cost of {} yoctaNEAR".format(
                 error['signer_id'],
                 error['balance'],
@@ -39,9 +69,26 @@ class NEARAccount:
             )
             raise RuntimeError(error_str)
 
-    def view_function(self, *args, **kwargs):
-        return self._account.view_function(*args, **kwargs)
+    def sign_and_submit_tx(self, receiver_id: str, actions: list) -> dict:
+        return self.submit_transaction(receiver_id, actions).result()
+
+    def function_call_async(self, contract_id: str, method_name: str, args: dict, gas: int = DEFAULT_ATTACHED_GAS, amount: int = 0) -> Future:
+        action = transactions.create_function_call_action(method_name, json.dumps(args).encode('utf8'), gas, amount)
+        return self.submit_transaction(contract_id, [action])
+
+    @track_backend("near_rpc")
+    def function_call(self, contract_id: str, method_name: str, args: dict, gas: int = DEFAULT_ATTACHED_GAS, amount: int = 0) -> dict:
+        return self.function_call_async(contract_id, method_name, args, gas, amount).result()
 
+    @track_backend("near_rpc")
+    def view_function(self, contract_id: str, method_name: str, args: dict) -> dict:
+        result = self.provider.view_call(contract_id, method_name, json.dumps(args).encode('utf8'))
+        if "error" in result:
+            raise ViewFunctionError(result["error"])
+        result["result"] = json.loads(bytes(result["result"]).decode('utf8'))
+        return result
+
+    @track_backend("near_rpc")
     def view_account(self, account_id):
         return self.provider.query({
             "request_type": "view_account",
@@ -55,76 +102,83 @@ class NEARAccount:
             "balance": int(self.view_account(account_id=self.account_id)['amount']) / 10 ** 24
         }
 
-    def _register_intent_public_key(self, contract_address: str):
-        pub_key = "ed25519:" + \
-            base58.b58encode(self.signer.public_key).decode('utf-8')
-        result = self.function_call(contract_address, "has_public_key", {
+    def _has_intent_public_key(self, contract_address: str) -> bool:
+        if self.public_key_cache.is_registered(contract_address, self.account_id, self.public_key):
+            return True
+        registered = self.view_function(contract_address, "has_public_key", {
             "account_id": self.account_id,
-            "public_key": pub_key
-        })
-        if not result.get('status').get('SuccessValue') == "dHJ1ZQ==":  # sucess = true
-            self.function_call(contract_address, "add_public_key", {
-                "public_key": pub_key
-            }, MAX_GAS, 1)
+            "public_key": self.public_key
+        }).get('result') is True
+        if registered:
+            self.public_key_cache.mark_registered(contract_address, self.account_id, self.public_key)
+        return registered
+
+    def _register_intent_public_key(self, contract_address: str):
+        if self._has_intent_public_key(contract_address=contract_address):
+            return
+        self.function_call(contract_address, "add_public_key", {
+            "public_key": self.public_key
+        }, MAX_GAS, 1)
+        self.public_key_cache.mark_registered(contract_address, self.account_id, self.public_key)
 
     def _has_storage_balance(self,  asset: AvailableToken, target_account_id: str = None):
         account_id = self.account_id if not target_account_id else target_account_id
+        if self.storage_cache.is_registered(asset.contract_address, account_id):
+            return True
         result = self.view_function(asset.contract_address, 'storage_balance_of', {
                                     'account_id': account_id}).get('result')
         if not result:
             return False
-        return True if int(result.get("total")) > 0 else False
+        if int(result.get("total")) > 0:
+            self.storage_cache.mark_registered(asset.contract_address, account_id)
+            return True
+        return False
 
     def _register_token_storage(self, asset: AvailableToken, target_account_id=None):
         account_id = self.account_id if not target_account_id else target_account_id
-        return self.function_call(asset.contract_address, 'storage_deposit',
-                                  {"account_id": account_id}, MAX_GAS, 1250000000000000000000)
+        result = self.function_call(asset.contract_address, 'storage_deposit',
+                                    {"account_id": account_id}, MAX_GAS, STORAGE_DEPOSIT_AMOUNT)
+        self.storage_cache.mark_registered(asset.contract_address, account_id)
+        return result
 
     def _sign_intent(self, message: dict) -> dict:
+        return self.sign_many([message])[0]
+
+    def sign_many(self, messages: list) -> list:
+        """Signs a list of NEP-413 messages, returning their signed payloads in order."""
         standard = "nep413"
         recipient = "intents.near"
-        nonce = generate_nonce()
-
-        msg_str = json.dumps(message, separators=(',', ':'))
-        signature = 'ed25519:' + base58.b58encode(
-            self.signer.sign(serialize_intent(
-                msg_str, recipient, nonce, standard))
-        ).decode('utf-8')
-
-        public_key = 'ed25519:' + \
-            base58.b58encode(self.signer.public_key).decode('utf-8')
+        sign = self.signer.sign
+        public_key = self.public_key
+        signed = []
+        for message in messages:
+            nonce = secrets.token_bytes(32)
+            msg_str = json.dumps(message, separators=(',', ':'))
+            signature = 'ed25519:' + base58.b58encode(
+                sign(serialize_intent(msg_str, recipient, nonce, standard))
+            ).decode('utf-8')
+            signed.append({
+                "standard": standard,
+                "payload": {
+                    "message": msg_str,
+                    "nonce": base64.b64encode(nonce).decode('utf-8'),
+                    "recipient": recipient,
+                },
+                "signature": signature,
+                "public_key": public_key,
+            })
+        return signed
 
+    def build_swap_intent(self, quote: dict) -> dict:
         return {
-            "standard": standard,
-            "payload": {
-                "message": msg_str,
-                "nonce": nonce,
-                "recipient": recipient,
+            "intent": "token_diff",
+            "diff": {
+                quote["defuse_asset_identifier_in"]: f"-{quote['amount_in']}",
+                quote["defuse_asset_identifier_out"]: quote["amount_out"],
             },
-            "signature": signature,
-            "public_key": public_key,
-        }
-
-    def sign_swap(self, quote: dict) -> dict:
-        message = {
-            "signer_id": self.account_id,
-            "deadline": quote["expiration_time"],
-            "intents": [
-                {
-                    "intent": "token_diff",
-                    "diff": {
-                        quote["defuse_asset_identifier_in"]: f"-{quote['amount_in']}",
-                        quote["defuse_asset_identifier_out"]: quote["amount_out"],
-                    },
-                },
-            ],
-        }
-        return {
-            "quote_hashes": [quote["quote_hash"]],
-            "signed_data": self._sign_intent(message)
         }
 
-    def sign_withdraw(self, asset: Token, amount: float, native_dest_address: str) -> dict:
+    def build_withdraw_intent(self, asset: Token, amount: float, native_dest_address: str) -> dict:
         intent = {"amount": asset.to_decimals(amount)}
         if asset.symbol == "NEAR":
             intent.update({
@@ -149,17 +203,26 @@ class NEARAccount:
                     "receiver_id": asset.near_token_id,
                     "memo": f"WITHDRAW_TO:{native_dest_address}"
                 })
+        return intent
 
+    def sign_intents(self, intents: list, deadline: str, quote_hashes: list = None) -> dict:
+        """Signs several intents, executed atomically, in a single NEP-413 message."""
         message = {
             "signer_id": self.account_id,
-            "deadline": generate_deadline(),
-            "intents": [intent],
+            "deadline": deadline,
+            "intents": intents,
         }
         return {
-            "quote_hashes": [],
+            "quote_hashes": quote_hashes if quote_hashes else [],
             "signed_data": self._sign_intent(message)
         }
 
+    def sign_swap(self, quote: dict) -> dict:
+        return self.sign_intents([self.build_swap_intent(quote)], quote["expiration_time"], [quote["quote_hash"]])
+
+    def sign_withdraw(self, asset: Token, amount: float, native_dest_address: str) -> dict:
+        return self.sign_intents([self.build_withdraw_intent(asset, amount, native_dest_address)], generate_deadline())
+
     def send(self, asset: AvailableToken, to_account_id: str, amount: float) -> str:
         if not self._has_storage_balance(asset=asset, target_account_id=to_account_id):
             self._register_token_storage(
@@ -176,4 +239,107 @@ class NEARAccount:
             raise Exception('failed to send transaction')
 
     def send_near(self, target_account_id: str, amount: float):
-        return self._account.send_money(target_account_id, int(amount * 10 ** 24))['transaction']['hash']
+        return self.sign_and_submit_tx(target_account_id, [transactions.create_transfer_action(int(amount * 10 ** 24))])['transaction']['hash']
+
+    def _missing_storage(self, registrations: dict, max_workers: int = STORAGE_CHECK_MAX_WORKERS) -> set:
+        """Returns the (contract_address, account_id) keys of `registrations`, mapped to their asset, without storage."""
+        unknown = [key for key in registrations if not self.storage_cache.is_registered(*key)]
+        if not unknown:
+            return set()
+
+        def check(key) -> bool:
+            try:
+                return self._has_storage_balance(asset=registrations[key], target_account_id=key[1])
+            except Exception:
+                # storage_deposit refunds accounts that are already registered
+                return False
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unknown))) as executor:
+            return {key for key, registered in zip(unknown, executor.map(check, unknown)) if not registered}
+
+    def plan_many(self, transfers: List[tuple], ft_transfer_gas: int = FT_TRANSFER_GAS) -> list:
+        """Packs many (asset, to_account_id, amount) transfers into as few transactions as possible.
+
+        The ft_transfer actions of each token contract, preceded by a storage_deposit for the recipients
+        without storage, are packed into multi-action transactions of at most MAX_GAS, attaching
+        `ft_transfer_gas` to each ft_transfer. An asset of None is a native NEAR transfer, sent in a
+        transaction of its own. Returns (receiver_id, actions, transfer indexes, accounts registered,
+        cost) tuples, the cost being the yoctoNEAR the transaction takes from the account, deposits and
+        prepaid gas included, at most.
+        """
+        if not 0 < ft_transfer_gas <= MAX_GAS - STORAGE_DEPOSIT_GAS:
+            raise ValueError(f"ft_transfer gas must be between 1 and {(MAX_GAS - STORAGE_DEPOSIT_GAS) // 10 ** 12} TGas")
+        missing = self._missing_storage({(asset.contract_address, to_account_id): asset
+                                         for asset, to_account_id, _ in transfers if asset is not None})
+        batches = []
+        by_contract = {}
+        for index, (asset, to_account_id, amount) in enumerate(transfers):
+            if asset is None:
+                deposit = int(amount * 10 ** 24)
+                batches.append((to_account_id, [transactions.create_transfer_action(deposit)], [index], [],
+                                deposit + TX_BASE_GAS * GAS_PRICE))
+            else:
+                by_contract.setdefault(asset.contract_address, []).append(index)
+        for contract_address, indexes in by_contract.items():
+            actions, gas, deposit, batch_indexes, registering = [], 0, 0, [], []
+            for index in indexes:
+                asset, to_account_id, amount = transfers[index]
+                transfer_actions, transfer_gas, transfer_deposit = [], ft_transfer_gas, 1
+                register = (contract_address, to_account_id) in missing
+                if register:
+                    missing.discard((contract_address, to_account_id))
+                    transfer_actions.append(transactions.create_function_call_action(
+                        'storage_deposit', json.dumps({"account_id": to_account_id}).encode('utf8'),
+                        STORAGE_DEPOSIT_GAS, STORAGE_DEPOSIT_AMOUNT))
+                    transfer_gas += STORAGE_DEPOSIT_GAS
+                    transfer_deposit += STORAGE_DEPOSIT_AMOUNT
+                transfer_actions.append(transactions.create_function_call_action(
+                    'ft_transfer', json.dumps({
+                        'receiver_id': to_account_id,
+                        'amount': asset.to_decimals(amount=amount),
+                        'msg': ""
+                    }).encode('utf8'), ft_transfer_gas, 1))
+                if actions and (gas + transfer_gas > MAX_GAS or len(actions) + len(transfer_actions) > MAX_ACTIONS_PER_TX):
+                    batches.append((contract_address, actions, batch_indexes, registering,
+                                    deposit + (gas + TX_BASE_GAS) * GAS_PRICE))
+                    actions, gas, deposit, batch_indexes, registering = [], 0, 0, [], []
+                actions.extend(transfer_actions)
+                gas += transfer_gas
+                deposit += transfer_deposit
+                batch_indexes.append(index)
+                if register:
+                    registering.append(to_account_id)
+            batches.append((contract_address, actions, batch_indexes, registering,
+                            deposit + (gas + TX_BASE_GAS) * GAS_PRICE))
+        return batches
+
+    @track_backend("near_rpc")
+    def send_many(self, transfers: List[tuple], ft_transfer_gas: int = FT_TRANSFER_GAS, batches: list = None) -> list:
+        """Sends many (asset, to_account_id, amount) transfers with as few transactions as possible,
+        packed by `plan_many` unless its `batches` are given.
+
+        Every transaction is broadcast before waiting for any of them. A transaction executes atomically,
+        so a failed action fails all of its transfers. Returns, for each transfer in order, the hash of
+        its transaction or the exception.
+        """
+        if batches is None:
+            batches = self.plan_many(transfers, ft_transfer_gas=ft_transfer_gas)
+        results = [None] * len(transfers)
+        submitted = []
+        for receiver_id, actions, indexes, registering, _ in batches:
+            try:
+                submitted.append((self.submit_transaction(receiver_id, actions), receiver_id, indexes, registering))
+            except Exception as e:
+                for index in indexes:
+                    results[index] = e
+        for future, receiver_id, indexes, registering in submitted:
+            try:
+                tx_hash = future.result()['transaction']['hash']
+            except Exception as e:
+                tx_hash = e
+            else:
+                for account_id in registering:
+                    self.storage_cache.mark_registered(receiver_id, account_id)
+            for index in indexes:
+                results[index] = tx_hash
+        return results
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 
 class Token(ABC):
+    __slots__ = ("defuse_asset_id", "symbol", "decimals", "blockchain")
+
     def __init__(self, **kwargs):
         self.defuse_asset_id = kwargs.get("defuse_asset_id")
         self.symbol = kwargs.get("symbol")
@@ -15,6 +17,8 @@ class Token(ABC):
         return str(int(amount * 10 ** self.decimals))
 
 class AvailableToken(Token):
+    __slots__ = ("contract_address", "price", "price_updated_at")
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.contract_address = kwargs.get('contract_address')
@@ -29,6 +33,8 @@ class AvailableToken(Token):
         return int(account.view_function(self.contract_address, 'ft_balance_of', {'account_id': account.account_id}).get('result')) / 10 ** self.decimals
 
 class BridgeableToken(Token):
+    __slots__ = ("near_token_id", "min_deposit_amount", "min_withdrawal_amount")
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.near_token_id = kwargs.get("near_token_id")
@@ -1,43 +1,44 @@
 from typing import List
 from .account import NEARAccount
 from .asset import AvailableToken
+from .token_catalog import TokenCatalog, get_shared_catalog
+from .token_registry import TokenRegistry, normalize_chain
 from near_api import transactions
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import json
 
-AVAILABLE_TOKENS_URL = "https://api-mng-console.chaindefuser.com/api/tokens"
+INTENTS_CONTRACT_ID = "intents.near"
+MT_BATCH_BALANCE_CHUNK_SIZE = 50
+MT_BATCH_BALANCE_MAX_WORKERS = 8
 
 class IntentContract:
-    def __init__(self):
-        self.contract_id = "intents.near"
-        self.available_tokens = dict()
-        self._fetch_available_tokens()
-        pass
+    def __init__(self, catalog: TokenCatalog = None):
+        self.contract_id = INTENTS_CONTRACT_ID
+        self.catalog = catalog if catalog is not None else get_shared_catalog()
 
-    def _fetch_available_tokens(self):
-        items = requests.get(
-            url=AVAILABLE_TOKENS_URL).json().get('items')
-        for item in items:
-            token = AvailableToken(**item)
-            if self.available_tokens.get(item['blockchain']):
-                self.available_tokens[item['blockchain']
-                                      ][item['symbol']] = token
-            else:
-                self.available_tokens[item['blockchain']] = {
-                    item['symbol']: token}
+    @property
+    def available_tokens(self) -> dict:
+        return self.catalog.tokens
 
+    @property
+    def registry(self) -> TokenRegistry:
+        return self.catalog.registry
 
     def get_chains(self) -> List[str]:
         return list(self.available_tokens.keys())
     
-    def get_token_price(self, symbol: str, chain: str) -> tuple[float, str]:
-        self._fetch_available_tokens()
+    def get_token_price(self, symbol: str, chain: str) -> tuple[float, str, float]:
+        """Returns the cached price, its update time and the catalog age in seconds.
+
+        Unlike token lookups, prices are never served from a catalog older than its TTL.
+        """
+        self.catalog.require_fresh()
         asset: AvailableToken = self.get_token(symbol=symbol, chain=chain)
-        return asset.price, asset.price_updated_at
+        return asset.price, asset.price_updated_at, self.catalog.age()
 
     def get_tokens_by_chain(self, chain: str) -> List[str]:
         try:
-            tokens: list = self.available_tokens.get(chain)
+            tokens: list = self.available_tokens.get(normalize_chain(chain))
             if not tokens:
                 return []
             return [token for token in tokens]
@@ -45,27 +46,42 @@ class IntentContract:
             raise ValueError(f"chain '{chain}' is not supported")
 
     def get_chains_by_token(self, symbol: str) -> List[str]:
-        try:
-            chains = []
-            for chain in self.available_tokens:
-                if not self.available_tokens[chain].get(symbol):
-                    continue
-                chains.append(chain) 
-            return chains
-        except KeyError:
-            raise ValueError(f"token '{symbol}' is not deployed in any chain")
+        return [record.chain for record in self.registry.by_symbol(symbol) if record.available]
 
     def get_token(self, symbol: str, chain: str) -> AvailableToken:
-        try:
-            return self.available_tokens[chain][symbol]
-        except KeyError:
-            raise ValueError(f"token '{symbol}' on chain '{chain}' not found")
+        return self.registry.get_available(symbol=symbol, chain=chain)
     
     def balance_of(self, asset: AvailableToken, account: NEARAccount) -> float:
         response = account.view_function(self.contract_id, 'mt_batch_balance_of', {
                                          'account_id': account.account_id, 'token_ids': [asset.get_asset_id()]}).get('result')
         return int(response[0]) / 10 ** asset.decimals
 
+    def batch_balance_of(self, assets: List[AvailableToken], account: NEARAccount,
+                         chunk_size: int = MT_BATCH_BALANCE_CHUNK_SIZE,
+                         max_workers: int = MT_BATCH_BALANCE_MAX_WORKERS) -> dict:
+        """Fetches the balances of many assets with chunked, concurrent mt_batch_balance_of calls.
+
+        Returns a {defuse_asset_id: balance} mapping covering every requested asset.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0")
+        unique = {asset.get_asset_id(): asset for asset in assets}
+        assets = list(unique.values())
+        chunks = [assets[i:i + chunk_size] for i in range(0, len(assets), chunk_size)]
+        if not chunks:
+            return {}
+
+        def fetch(chunk: List[AvailableToken]) -> dict:
+            response = account.view_function(self.contract_id, 'mt_batch_balance_of', {
+                'account_id': account.account_id, 'token_ids': [asset.get_asset_id() for asset in chunk]}).get('result')
+            return {asset.get_asset_id(): int(amount) / 10 ** asset.decimals for asset, amount in zip(chunk, response)}
+
+        balances = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            for chunk_balances in executor.map(fetch, chunks):
+                balances.update(chunk_balances)
+        return balances
+
     def deposit(self, asset: AvailableToken, amount: float, account: NEARAccount) -> str:
         return account.function_call(asset.contract_address,
                                      'ft_transfer_call', {
@@ -77,7 +93,8 @@ class IntentContract:
 
     def deposit_near(self, amount: float, account: NEARAccount) -> str:
         wnear_asset: AvailableToken = self.get_token(symbol="wNEAR", chain="near")
-        account._register_token_storage(asset=wnear_asset)
+        if not account._has_storage_balance(asset=wnear_asset):
+            account._register_token_storage(asset=wnear_asset)
         yoctoamount = int(amount * 10 ** 24)
         actions = [
             transactions.create_function_call_action(
@@ -97,4 +114,4 @@ class IntentContract:
                 deposit=1
             )
         ]
-        return account._account._sign_and_submit_tx("wrap.near", actions)['transaction']['hash']
\ No newline at end of file
+        return account.sign_and_submit_tx("wrap.near", actions)['transaction']['hash']
\ No newline at end of file
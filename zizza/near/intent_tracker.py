@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+INTENT_POLL_MIN_INTERVAL = 0.5
+INTENT_POLL_MAX_INTERVAL = 5
+INTENT_POLL_BACKOFF = 1.5
+INTENT_CONFIRMATION_TIMEOUT = 300
+IN_FLIGHT_STATUSES = ("SETTLED", "PENDING", "TX_BROADCASTED")
+
+logger = logging.getLogger(__name__)
+
+
+class IntentTimeoutError(TimeoutError):
+    pass
+
+
+class _PendingIntent:
+    __slots__ = ("future", "deadline", "interval", "next_poll")
+
+    def __init__(self, future: Future, deadline: float, interval: float):
+        self.future = future
+        self.deadline = deadline
+        self.interval = interval
+        self.next_poll = time.monotonic()
+
+
+class IntentTracker:
+    """Tracks the settlement of published intents from a single background thread.
+
+    Every cycle the statuses of all intents due for a poll are fetched with one call to
+    `fetch_statuses`. Each intent backs off from `min_interval` to `max_interval` while
+    its status does not change; its future resolves to (status, tx_hash) once a tx hash
+    is known or the intent failed, or to IntentTimeoutError after its deadline.
+    """
+
+    def __init__(self, fetch_statuses: Callable[[List[str]], Dict[str, tuple]],
+                 min_interval: float = INTENT_POLL_MIN_INTERVAL, max_interval: float = INTENT_POLL_MAX_INTERVAL,
+                 backoff: float = INTENT_POLL_BACKOFF, timeout: float = INTENT_CONFIRMATION_TIMEOUT):
+        self.fetch_statuses = fetch_statuses
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self._pending: Dict[str, _PendingIntent] = {}
+        self._changed = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, intent_hash: str, timeout: Optional[float] = None) -> Future:
+        """Starts tracking an intent, returning a future resolved with (status, tx_hash)."""
+        with self._changed:
+            entry = self._pending.get(intent_hash)
+            if entry:
+                return entry.future
+            deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+            entry = self._pending[intent_hash] = _PendingIntent(Future(), deadline, self.min_interval)
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="intent-tracker", daemon=True)
+                self._thread.start()
+            self._changed.notify()
+            return entry.future
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while True:
+                    if not self._pending:
+                        self._changed.wait()
+                        continue
+                    now = time.monotonic()
+                    self._expire_locked(now)
+                    due = [intent_hash for intent_hash, entry in self._pending.items() if entry.next_poll <= now]
+                    if due:
+                        break
+                    if self._pending:
+                        wake_at = min(min(entry.next_poll, entry.deadline) for entry in self._pending.values())
+                        self._changed.wait(max(wake_at - now, 0))
+            try:
+                statuses = self.fetch_statuses(due)
+            except Exception as e:
+                logger.warning("failed to fetch the status of %d intents: %s", len(due), e)
+                statuses = {}
+            with self._changed:
+                now = time.monotonic()
+                for intent_hash in due:
+                    entry = self._pending.get(intent_hash)
+                    if not entry:
+                        continue
+                    status, tx_hash = statuses.get(intent_hash, (None, None))
+                    if status and status not in IN_FLIGHT_STATUSES:
+                        self._resolve_locked(intent_hash, (status, None))
+                    elif tx_hash:
+                        self._resolve_locked(intent_hash, (status, tx_hash))
+                    else:
+                        entry.interval = min(entry.interval * self.backoff, self.max_interval)
+                        entry.next_poll = now + entry.interval
+
+    def _expire_locked(self, now: float):
+        for intent_hash in [intent_hash for intent_hash, entry in self._pending.items() if entry.deadline <= now]:
+            entry = self._pending.pop(intent_hash)
+            entry.future.set_exception(IntentTimeoutError(f"intent {intent_hash} not confirmed before the deadline"))
+
+    def _resolve_locked(self, intent_hash: str, result: tuple):
+        entry = self._pending.pop(intent_hash)
+        entry.future.set_result(result)
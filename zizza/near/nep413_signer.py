@@ -1,32 +1,42 @@
 import base64
 import hashlib
-from borsh_construct import CStruct, String, Option, U8
+import struct
 
 standard_number = {
     "nep413": 413,
 }
 
-Nep413PayloadSchema = CStruct(
-    "message" / String,
-    "nonce" / U8[32],
-    "recipient" / String,
-    "callback_url" / Option(String),
-)
+# Borsh encoding of the NEP-413 prefix tag, 2^31 + standard number as little-endian u32
+_standard_prefix = {
+    standard: ((2 ** 31) + number).to_bytes(4, byteorder='little', signed=False)
+    for standard, number in standard_number.items()
+}
+# Borsh encoding of callback_url: Option<String> = None
+_NO_CALLBACK_URL = b"\x00"
+_U32 = struct.Struct('<I')
 
 def base64_to_uint8_array(b64_str):
     return list(base64.b64decode(b64_str))
 
+def _borsh_string(value: str) -> bytes:
+    encoded = value.encode('utf-8')
+    return _U32.pack(len(encoded)) + encoded
+
+def encode_payload(intent_message, recipient, nonce, standard="nep413") -> bytes:
+    """Borsh-encodes the tagged NEP-413 payload {message, nonce: [u8; 32], recipient, callback_url: None}.
+
+    `nonce` may be given base64 encoded or as raw bytes.
+    """
+    nonce_bytes = base64.b64decode(nonce) if isinstance(nonce, str) else bytes(nonce)
+    if len(nonce_bytes) != 32:
+        raise ValueError(f"NEP-413 nonce must be 32 bytes long, got {len(nonce_bytes)}")
+    return b"".join((
+        _standard_prefix[standard],
+        _borsh_string(intent_message),
+        nonce_bytes,
+        _borsh_string(recipient),
+        _NO_CALLBACK_URL,
+    ))
+
 def serialize_intent(intent_message, recipient, nonce, standard="nep413"):
-    payload = {
-        "message": intent_message,
-        "nonce": base64_to_uint8_array(nonce),
-        "recipient": recipient,
-        "callback_url": None,
-    }
-    
-    payload_serialized = Nep413PayloadSchema.build(payload)
-    
-    base_int = (2 ** 31) + standard_number[standard]
-    base_int_serialized = base_int.to_bytes(4, byteorder='little', signed=False)
-    combined_data = base_int_serialized + payload_serialized
-    return hashlib.sha256(combined_data).digest()
+    return hashlib.sha256(encode_payload(intent_message, recipient, nonce, standard)).digest()
@@ -1,49 +1,64 @@
-import requests
+import os
+import threading
 from .asset import BridgeableToken
+from .token_registry import TokenRegistry, get_token_registry
+from ..metrics import track_backend
+from ..transport import HTTPTransport, get_transport
+
+OMNI_BRIDGE_RPC_URL = os.getenv("ZIZZA_OMNI_BRIDGE_URL", "https://bridge.chaindefuser.com/rpc")
+OMNI_BRIDGE_TIMEOUT = 15
+
+_supported_tokens = dict()
+_supported_lock = threading.Lock()
+
+
+@track_backend("omni_bridge", "supported_tokens")
+def _fetch_supported_tokens(url: str, transport: HTTPTransport) -> list:
+    body = {
+        "id": "dontcare",
+        "jsonrpc": "2.0",
+        "method": "supported_tokens",
+        "params": []
+    }
+    response = transport.post(url, json=body, timeout=OMNI_BRIDGE_TIMEOUT).json()
+    supported = []
+    for token in response.get('result').get('tokens'):
+        if "-" in token['near_token_id']:
+            blockchain = token['near_token_id'].split("-")[0]
+        else:
+            blockchain = token['asset_name'].lower()
+        bridgeable_token = BridgeableToken(
+            defuse_asset_id=token['defuse_asset_identifier'],
+            symbol=token['asset_name'],
+            blockchain=blockchain,
+            **token)
+        supported.append(bridgeable_token)
+    return supported
+
+
+def get_supported_tokens(url: str = OMNI_BRIDGE_RPC_URL, transport: HTTPTransport = None) -> list:
+    """Returns the bridgeable tokens of `url`, fetched once and shared by every OmniBridge."""
+    with _supported_lock:
+        if url not in _supported_tokens:
+            _supported_tokens[url] = _fetch_supported_tokens(url, transport if transport is not None else get_transport())
+        return _supported_tokens[url]
 
-OMNI_BRIDGE_RPC_URL = "https://bridge.chaindefuser.com/rpc"
 
 class OmniBridge:
-    """Fetch supported tokens"""
+    """Fetch supported tokens, indexed in `registry` next to the intents catalog"""
 
-    def __init__(self, url=OMNI_BRIDGE_RPC_URL):
+    def __init__(self, url=OMNI_BRIDGE_RPC_URL, transport: HTTPTransport = None, registry: TokenRegistry = None):
         self.url = url
-        self._supported = dict()
-        # Fetch supported bridgeable tokens
-        body = {
-            "id": "dontcare",
-            "jsonrpc": "2.0",
-            "method": "supported_tokens",
-            "params": []
-        }
-        response = requests.post(url=url, json=body).json()
-        for token in response.get('result').get('tokens'):
-            if "-" in token['near_token_id']:
-                blockchain = token['near_token_id'].split("-")[0]
-            else:
-                blockchain = token['asset_name'].lower()
-            bridgeable_token = BridgeableToken(
-                defuse_asset_id=token['defuse_asset_identifier'],
-                symbol=token['asset_name'],
-                blockchain=blockchain,
-                **token)
-
-            if self._supported.get(blockchain):
-                self._supported[blockchain][token['asset_name']] = bridgeable_token
-            else:
-                self._supported[blockchain] = {
-                    token['asset_name']: bridgeable_token}
-        pass
+        self.transport = transport if transport is not None else get_transport()
+        self.registry = registry if registry is not None else get_token_registry()
+        supported = get_supported_tokens(url, self.transport)
+        if self.registry.bridgeable_tokens is not supported:
+            self.registry.load(bridgeable=supported)
 
     def get_token(self, symbol: str, chain: str) -> BridgeableToken:
-        chain = self._supported.get(chain)
-        if not chain:
-            return None
-        token = chain.get(symbol)
-        if not token:
-            return None
-        return token
+        return self.registry.get_bridgeable(symbol=symbol, chain=chain)
 
+    @track_backend("omni_bridge")
     def get_deposit_address(self, token: BridgeableToken, account_id: str) -> str:
         chain = ":".join(token.defuse_asset_id.split(":")[:-1])
         body = {
@@ -57,4 +72,4 @@ class OmniBridge:
                 }
             ]
         }
-        return requests.post(url=self.url, json=body).json()['result']['address']
\ No newline at end of file
+        return self.transport.post(self.url, json=body, timeout=OMNI_BRIDGE_TIMEOUT).json()['result']['address']
\ No newline at end of file
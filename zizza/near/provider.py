@@ -0,0 +1,29 @@
+from near_api.providers import JsonProvider, JsonProviderError
+from ..transport import HTTPTransport, get_transport
+
+
+class PooledJsonProvider(JsonProvider):
+    """A near_api JsonProvider sending its RPC calls through the shared pooled transport."""
+
+    def __init__(self, rpc_addr, transport: HTTPTransport = None):
+        super().__init__(rpc_addr)
+        self.transport = transport if transport is not None else get_transport()
+
+    def json_rpc(self, method, params, timeout=2):
+        j = {
+            'method': method,
+            'params': params,
+            'id': 'dontcare',
+            'jsonrpc': '2.0'
+        }
+        r = self.transport.post(self.rpc_addr(), json=j, timeout=timeout)
+        r.raise_for_status()
+        content = r.json()
+        if "error" in content:
+            raise JsonProviderError(content["error"])
+        return content["result"]
+
+    def get_status(self):
+        r = self.transport.get("%s/status" % self.rpc_addr(), timeout=2)
+        r.raise_for_status()
+        return r.json()
@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Hashable, Optional
+
+QUOTE_EXPIRY_MARGIN = 5
+QUOTE_CACHE_MAX_ENTRIES = 1024
+
+
+def parse_expiration_time(expiration_time: str) -> Optional[float]:
+    """Converts a solver bus expiration time (e.g. 2025-03-27T12:34:56.789Z) to a unix timestamp."""
+    try:
+        expires_at = datetime.fromisoformat(expiration_time.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
+
+
+class QuoteCache:
+    """An LRU cache of best quotes that drops each entry `margin` seconds before its quote expires."""
+
+    def __init__(self, margin: float = QUOTE_EXPIRY_MARGIN, max_entries: int = QUOTE_CACHE_MAX_ENTRIES):
+        self.margin = margin
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] - self.margin > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: tuple, expiration_time: str):
+        expires_at = parse_expiration_time(expiration_time)
+        if expires_at is None or expires_at - self.margin <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+STORAGE_REGISTRATION_HORIZON = 30 * 24 * 3600
+PUBLIC_KEY_REGISTRATION_HORIZON = 30 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+class RegistrationCache:
+    """Remembers on-chain registrations that are effectively permanent.
+
+    A key (e.g. (contract_address, account_id)) confirmed as registered is trusted for
+    `horizon` seconds without re-checking it. When `path` is given the cache is loaded
+    from and written to that JSON file, so it survives restarts.
+    """
+
+    def __init__(self, horizon: float = STORAGE_REGISTRATION_HORIZON, path: Optional[str] = None):
+        self.horizon = horizon
+        self.path = path
+        self._entries: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def is_registered(self, *key: str) -> bool:
+        with self._lock:
+            confirmed_at = self._entries.get(key)
+        return confirmed_at is not None and time.time() - confirmed_at < self.horizon
+
+    def mark_registered(self, *key: str):
+        with self._lock:
+            self._entries[key] = time.time()
+            self._save_locked()
+
+    def forget(self, *key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save_locked()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("ignoring unreadable registration cache %s: %s", self.path, e)
+            return
+        self._entries = {tuple(entry[:-1]): float(entry[-1]) for entry in entries}
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump([[*key, confirmed_at] for key, confirmed_at in self._entries.items()], f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("failed to persist registration cache %s: %s", self.path, e)
+
+
+_storage_cache: Optional[RegistrationCache] = None
+_public_key_cache: Optional[RegistrationCache] = None
+_caches_lock = threading.Lock()
+
+
+def get_storage_cache() -> RegistrationCache:
+    """Returns the process-wide storage registration cache, persisted to $ZIZZA_STORAGE_CACHE_PATH if set."""
+    global _storage_cache
+    with _caches_lock:
+        if _storage_cache is None:
+            _storage_cache = RegistrationCache(path=os.getenv("ZIZZA_STORAGE_CACHE_PATH"))
+        return _storage_cache
+
+
+def set_storage_cache(cache: RegistrationCache):
+    global _storage_cache
+    with _caches_lock:
+        _storage_cache = cache
+
+
+def get_public_key_cache() -> RegistrationCache:
+    """Returns the process-wide intents public key cache, persisted to $ZIZZA_PUBLIC_KEY_CACHE_PATH if set."""
+    global _public_key_cache
+    with _caches_lock:
+        if _public_key_cache is None:
+            _public_key_cache = RegistrationCache(horizon=PUBLIC_KEY_REGISTRATION_HORIZON,
+                                                  path=os.getenv("ZIZZA_PUBLIC_KEY_CACHE_PATH"))
+        return _public_key_cache
+
+
+def set_public_key_cache(cache: RegistrationCache):
+    global _public_key_cache
+    with _caches_lock:
+        _public_key_cache = cache
@@ -1,13 +1,34 @@
-import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Union
+import logging
+import os
+import threading
 from .asset import AvailableToken
-from time import sleep
+from .intent_tracker import IntentTracker
+from .quote_cache import QuoteCache
+from ..executor import signing_slot
+from ..metrics import track_backend
+from ..transport import HTTPTransport, get_transport
 
-SOLVER_BUS_URL = "https://solver-relay-v2.chaindefuser.com/rpc"
+SOLVER_BUS_URL = os.getenv("ZIZZA_SOLVER_URL", "https://solver-relay-v2.chaindefuser.com/rpc")
+SOLVER_TIMEOUT = 15
+QUOTE_MAX_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+_trackers: Dict[str, IntentTracker] = dict()
+_trackers_lock = threading.Lock()
+_quote_caches: Dict[str, QuoteCache] = dict()
+_quote_caches_lock = threading.Lock()
 
 class Solver:
-    def __init__(self, url=SOLVER_BUS_URL):
+    def __init__(self, url=SOLVER_BUS_URL, transport: HTTPTransport = None, timeout=SOLVER_TIMEOUT):
         self.url = url
+        self.transport = transport if transport is not None else get_transport()
+        self.timeout = timeout
+        self._batch_status_supported = True
 
+    @track_backend("solver")
     def _get_quotes(self, asset_in: AvailableToken, asset_out: AvailableToken, amount_in):
         """Fetches the trading options from the solver bus."""
         rpc_request = {
@@ -22,21 +43,61 @@ class Solver:
                 },
             ]
         }
-        response = requests.post(self.url, json=rpc_request)
+        response = self.transport.post(self.url, json=rpc_request, timeout=self.timeout)
         response_json = response.json()
         return response_json.get("result", [])
     
-    def get_best_quote(self, asset_in: AvailableToken, asset_out: AvailableToken, amount_in: float) -> tuple[str,float, str, dict]:
-        quotes = self._get_quotes(asset_in, asset_out, asset_in.to_decimals(amount_in))
+    @property
+    def quote_cache(self) -> QuoteCache:
+        """The quote cache shared by every Solver of the same relay."""
+        with _quote_caches_lock:
+            cache = _quote_caches.get(self.url)
+            if not cache:
+                cache = _quote_caches[self.url] = QuoteCache()
+            return cache
+
+    def get_best_quote(self, asset_in: AvailableToken, asset_out: AvailableToken, amount_in: float, use_cache: bool = True) -> tuple[str,float, str, dict]:
+        """Returns the best quote, from the shared quote cache with `use_cache`.
+
+        Without `use_cache`, the quote is fetched from the relay and not cached, so a quote about to be
+        signed is never handed to another caller.
+        """
+        exact_amount_in = asset_in.to_decimals(amount_in)
+        key = (asset_in.get_asset_id(), asset_out.get_asset_id(), exact_amount_in)
+        if use_cache:
+            cached = self.quote_cache.get(key)
+            if cached:
+                return cached
+        quotes = self._get_quotes(asset_in, asset_out, exact_amount_in)
         if not quotes:
             raise Exception(f"unable to find a quote to swap {amount_in} {asset_in.symbol} to {asset_out.symbol}")
         if any(q.get('type') == 'INSUFFICIENT_AMOUNT' for q in quotes):
             raise ValueError(f"{amount_in} for {asset_in.symbol} results in INSUFFICIENT_AMOUNT to get a quote")
         best_quote = max(quotes, key=lambda x: int(x['amount_out']))
         amount_out = int(best_quote['amount_out']) / 10 ** asset_out.decimals
-        return best_quote['quote_hash'], amount_out, best_quote['expiration_time'],  best_quote
+        result = best_quote['quote_hash'], amount_out, best_quote['expiration_time'],  best_quote
+        if use_cache:
+            self.quote_cache.put(key, result, best_quote['expiration_time'])
+        return result
+
+    def get_best_quotes(self, pairs: List[tuple], max_workers: int = QUOTE_MAX_WORKERS) -> List[Union[tuple, Exception]]:
+        """Fetches the best quote of many (asset_in, asset_out, amount_in) requests concurrently.
+
+        Results keep the order of `pairs`; a request that fails yields its exception instead of a quote.
+        """
+        def fetch(pair):
+            try:
+                return self.get_best_quote(*pair)
+            except Exception as e:
+                return e
+
+        if not pairs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pairs))) as executor:
+            return list(executor.map(fetch, pairs))
     
 
+    @track_backend("solver")
     def get_intent_status(self, intent_hash: str) -> tuple:
         rpc_request = {
             "id": "dontcare",
@@ -46,11 +107,54 @@ class Solver:
                 {"intent_hash": intent_hash}
             ]
         }
-        res = requests.post(self.url, json=rpc_request).json()['result']
+        res = self.transport.post(self.url, json=rpc_request, timeout=self.timeout).json()['result']
         if res.get('data'):
             return res['status'], res['data'].get('hash')
         return res['status'], None
 
+    @track_backend("solver")
+    def get_intent_statuses(self, intent_hashes: List[str]) -> Dict[str, tuple]:
+        """Fetches the status of many intents with a single JSON-RPC batch request."""
+        if self._batch_status_supported and len(intent_hashes) > 1:
+            rpc_requests = [{
+                "id": index,
+                "jsonrpc": "2.0",
+                "method": "get_status",
+                "params": [
+                    {"intent_hash": intent_hash}
+                ]
+            } for index, intent_hash in enumerate(intent_hashes)]
+            try:
+                responses = self.transport.post(self.url, json=rpc_requests, timeout=self.timeout).json()
+            except Exception as e:
+                logger.warning("batched get_status failed, polling intents one by one: %s", e)
+                responses = None
+            if isinstance(responses, list):
+                statuses = {}
+                for response in responses:
+                    res = response.get('result')
+                    if res is None or not isinstance(response.get('id'), int):
+                        continue
+                    statuses[intent_hashes[response['id']]] = (res['status'], (res.get('data') or {}).get('hash'))
+                return statuses
+            # The relay does not accept batches, poll the intents one by one from now on
+            self._batch_status_supported = False
+        return {intent_hash: self.get_intent_status(intent_hash=intent_hash) for intent_hash in intent_hashes}
+
+    @property
+    def tracker(self) -> IntentTracker:
+        """The intent tracker shared by every Solver of the same relay."""
+        with _trackers_lock:
+            tracker = _trackers.get(self.url)
+            if not tracker:
+                tracker = _trackers[self.url] = IntentTracker(self.get_intent_statuses)
+            return tracker
+
+    def track_intent(self, intent_hash: str, timeout: float = None) -> Future:
+        """Returns a future resolved with (status, tx_hash) once the intent settles or fails."""
+        return self.tracker.track(intent_hash, timeout=timeout)
+
+    @track_backend("solver")
     def publish_intent(self, signed_intent) -> str:
         """Publishes the signed intent to the solver bus."""
         rpc_request = {
@@ -60,16 +164,11 @@ class Solver:
             "params": [signed_intent]
         }
         try:
-            res = requests.post(self.url, json=rpc_request).json()['result']
+            with signing_slot():
+                res = self.transport.post(self.url, json=rpc_request, timeout=self.timeout).json()['result']
             return res['intent_hash']
         except Exception as e:
             raise RuntimeError(f"Publish intent smart contract failed: {str(e)}")
 
-    def wait_for_intent_confirmed(self, intent_hash):
-        while True:
-            status, tx_hash = self.get_intent_status(intent_hash=intent_hash)
-            if status not in ["SETTLED", "PENDING", "TX_BROADCASTED"]:
-                return (status, None) 
-            elif tx_hash:
-                return (status, tx_hash) 
-            sleep(1)
\ No newline at end of file
+    def wait_for_intent_confirmed(self, intent_hash, timeout: float = None):
+        return self.track_intent(intent_hash, timeout=timeout).result()
\ No newline at end of file
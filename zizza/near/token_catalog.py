@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from .asset import AvailableToken
+from .token_registry import TokenRegistry, get_token_registry
+from ..metrics import track_backend
+from ..transport import HTTPTransport, get_transport
+
+AVAILABLE_TOKENS_URL = os.getenv("ZIZZA_TOKENS_URL", "https://api-mng-console.chaindefuser.com/api/tokens")
+CATALOG_TTL = 300
+CATALOG_REFRESH_INTERVAL = 60
+CATALOG_TIMEOUT = 30
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCatalog:
+    """Caches the available tokens catalog and keeps it fresh from a background thread.
+
+    The catalog is downloaded once on first use; afterwards lookups are answered from
+    memory, from the last good download, while a daemon thread revalidates it with
+    conditional requests (If-None-Match / If-Modified-Since) every `refresh_interval`
+    seconds and retries on failure. `age` reports how old the data is; only
+    `require_fresh`, used for prices, enforces `ttl`. Downloaded tokens are indexed in
+    `registry`.
+    """
+
+    def __init__(self, url: str = AVAILABLE_TOKENS_URL, ttl: float = CATALOG_TTL,
+                 refresh_interval: float = CATALOG_REFRESH_INTERVAL, transport: HTTPTransport = None,
+                 registry: TokenRegistry = None):
+        self.url = url
+        self.transport = transport if transport is not None else get_transport()
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._registry = registry if registry is not None else TokenRegistry()
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._validated_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    @property
+    def registry(self) -> TokenRegistry:
+        """Returns the registry indexing the catalog, blocking on the network only before warm-up.
+
+        Raises:
+            RuntimeError: If the catalog was never loaded and can not be downloaded.
+        """
+        if self._validated_at is None:
+            self._revalidate(max_age=self.ttl)
+        return self._registry
+
+    def require_fresh(self):
+        """Revalidates the catalog if it is older than `ttl`, for reads that must not serve stale data.
+
+        Raises:
+            RuntimeError: If the catalog is older than `ttl` and can not be revalidated.
+        """
+        if self.is_stale():
+            self._revalidate(max_age=self.ttl)
+
+    @property
+    def tokens(self) -> Dict[str, Dict[str, AvailableToken]]:
+        """Returns the {chain: {symbol: AvailableToken}} catalog, see `registry`."""
+        return self.registry.available_tokens
+
+    def load(self, items: List[dict]):
+        """Replaces the catalog with the given raw catalog items."""
+        self._registry.load(available=[AvailableToken(**item) for item in items])
+        self._validated_at = time.monotonic()
+
+    def _revalidate(self, max_age: float):
+        try:
+            self.refresh(max_age=max_age)
+        except Exception as e:
+            age = self.age()
+            state = "not loaded" if age is None else f"{age:.0f}s old"
+            raise RuntimeError(f"token catalog is {state} and could not be refreshed: {e}") from e
+
+    def refresh(self, force: bool = False, max_age: float = None) -> bool:
+        """Revalidates the catalog if it is older than `max_age` (by default `ttl`) or with `force`;
+        returns True when new data was downloaded."""
+        with self._lock:
+            if not force and not self.is_stale(max_age):
+                return False
+            return self._refresh_locked()
+
+    @track_backend("token_catalog", "refresh")
+    def _refresh_locked(self) -> bool:
+        headers = {}
+        if self._validated_at is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+        response = self.transport.get(self.url, headers=headers, timeout=CATALOG_TIMEOUT)
+        if response.status_code == 304:
+            self._validated_at = time.monotonic()
+            return False
+        response.raise_for_status()
+        self.load(response.json().get('items'))
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        return True
+
+    def age(self) -> Optional[float]:
+        """Seconds elapsed since the catalog was last downloaded or revalidated."""
+        if self._validated_at is None:
+            return None
+        return time.monotonic() - self._validated_at
+
+    def is_stale(self, max_age: float = None) -> bool:
+        age = self.age()
+        return age is None or age >= (self.ttl if max_age is None else max_age)
+
+    def start(self):
+        """Starts the background refresher thread, if not already running."""
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="token-catalog-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                # skipped when a price read revalidated the catalog in the meantime
+                self.refresh(max_age=self.refresh_interval)
+            except Exception as e:
+                logger.warning("token catalog refresh failed, serving data %.0fs old: %s", self.age() or 0, e)
+
+
+_shared_catalogs: Dict[str, TokenCatalog] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_catalog(url: str = AVAILABLE_TOKENS_URL) -> TokenCatalog:
+    """Returns the process-wide catalog for `url`, starting its refresher on first use."""
+    with _shared_lock:
+        catalog = _shared_catalogs.get(url)
+        if not catalog:
+            # the default catalog feeds the registry shared with the omni bridge
+            registry = get_token_registry() if url == AVAILABLE_TOKENS_URL else None
+            catalog = _shared_catalogs[url] = TokenCatalog(url=url, registry=registry)
+            catalog.start()
+        return catalog
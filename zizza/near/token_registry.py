@@ -0,0 +1,150 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from .asset import AvailableToken, BridgeableToken
+
+# Chain names used by the omni bridge that the intents catalog spells differently
+CHAIN_ALIASES = {
+    "bitcoin": "btc",
+    "dogecoin": "doge",
+    "ethereum": "eth",
+    "solana": "sol",
+    "zcash": "zec",
+}
+
+
+def normalize_chain(chain: str) -> str:
+    chain = chain.lower()
+    return CHAIN_ALIASES.get(chain, chain)
+
+
+class TokenRecord:
+    """A token of one chain, with its intents catalog and omni bridge entries when it has them."""
+    __slots__ = ("chain", "symbol", "available", "bridgeable")
+
+    def __init__(self, chain: str, symbol: str):
+        self.chain = chain
+        self.symbol = symbol
+        self.available: Optional[AvailableToken] = None
+        self.bridgeable: Optional[BridgeableToken] = None
+
+    @property
+    def defuse_asset_id(self) -> str:
+        return self.available.defuse_asset_id if self.available else self.bridgeable.get_asset_id()
+
+    @property
+    def contract_address(self) -> str:
+        return self.available.contract_address if self.available else self.bridgeable.near_token_id
+
+
+class _TokenIndex:
+    """An immutable snapshot of the registry, with every lookup precomputed."""
+    __slots__ = ("records", "by_chain_symbol", "by_symbol", "by_asset_id", "by_contract", "available_tokens")
+
+    def __init__(self, available: Iterable[AvailableToken], bridgeable: Iterable[BridgeableToken]):
+        records: Dict[Tuple[str, str], TokenRecord] = {}
+        available_tokens: Dict[str, Dict[str, AvailableToken]] = {}
+        for source, tokens in (("available", available), ("bridgeable", bridgeable)):
+            for token in tokens:
+                chain = normalize_chain(token.blockchain)
+                record = records.get((chain, token.symbol))
+                if record is None:
+                    record = records[chain, token.symbol] = TokenRecord(chain, token.symbol)
+                setattr(record, source, token)
+                if source == "available":
+                    available_tokens.setdefault(chain, {})[token.symbol] = token
+        self.records: List[TokenRecord] = list(records.values())
+        self.available_tokens = available_tokens
+        # exact (chain, symbol) keys override the lowercased ones, so exact matches always win
+        self.by_chain_symbol: Dict[Tuple[str, str], TokenRecord] = {}
+        self.by_symbol: Dict[str, List[TokenRecord]] = {}
+        for record in self.records:
+            self.by_chain_symbol.setdefault((record.chain, record.symbol.lower()), record)
+            self.by_symbol.setdefault(record.symbol.lower(), []).append(record)
+        self.by_chain_symbol.update(records)
+        self.by_asset_id: Dict[str, TokenRecord] = {}
+        self.by_contract: Dict[str, TokenRecord] = {}
+        for record in self.records:
+            if record.bridgeable:
+                self.by_asset_id[record.bridgeable.get_asset_id()] = record
+                self.by_asset_id[record.bridgeable.defuse_asset_id] = record
+                self.by_contract[record.bridgeable.near_token_id] = record
+            if record.available:
+                self.by_asset_id[record.available.defuse_asset_id] = record
+                if record.available.contract_address:
+                    self.by_contract[record.available.contract_address] = record
+
+
+class TokenRegistry:
+    """One indexed view of the tokens of the intents catalog and of the omni bridge.
+
+    Each source replaces its tokens with `load`, which builds a new index and swaps it in with a
+    single assignment, so lookups are lock-free and never see a half-built index. Symbols are
+    matched case-insensitively, preferring an exact match, and chain names are normalized.
+    """
+
+    def __init__(self):
+        self._available: List[AvailableToken] = []
+        self._bridgeable: List[BridgeableToken] = []
+        self._index = _TokenIndex([], [])
+        self._lock = threading.Lock()
+
+    def load(self, available: Iterable[AvailableToken] = None, bridgeable: Iterable[BridgeableToken] = None):
+        """Replaces the tokens of the given sources, keeping those of the other one."""
+        with self._lock:
+            if available is not None:
+                self._available = available if isinstance(available, list) else list(available)
+            if bridgeable is not None:
+                self._bridgeable = bridgeable if isinstance(bridgeable, list) else list(bridgeable)
+            self._index = _TokenIndex(self._available, self._bridgeable)
+
+    @property
+    def bridgeable_tokens(self) -> List[BridgeableToken]:
+        """The omni bridge tokens as last loaded."""
+        return self._bridgeable
+
+    @property
+    def available_tokens(self) -> Dict[str, Dict[str, AvailableToken]]:
+        """The intents catalog as {chain: {symbol: AvailableToken}}."""
+        return self._index.available_tokens
+
+    def get(self, symbol: str, chain: str) -> Optional[TokenRecord]:
+        chain = normalize_chain(chain)
+        index = self._index
+        return index.by_chain_symbol.get((chain, symbol)) or index.by_chain_symbol.get((chain, symbol.lower()))
+
+    def get_available(self, symbol: str, chain: str) -> AvailableToken:
+        record = self.get(symbol, chain)
+        if record is None or record.available is None:
+            raise ValueError(f"token '{symbol}' on chain '{chain}' not found")
+        return record.available
+
+    def get_bridgeable(self, symbol: str, chain: str) -> BridgeableToken:
+        record = self.get(symbol, chain)
+        if record is None or record.bridgeable is None:
+            raise ValueError(f"token '{symbol}' on chain '{chain}' is not supported by the omni bridge")
+        return record.bridgeable
+
+    def by_symbol(self, symbol: str) -> List[TokenRecord]:
+        return list(self._index.by_symbol.get(symbol.lower(), ()))
+
+    def by_asset_id(self, defuse_asset_id: str) -> Optional[TokenRecord]:
+        return self._index.by_asset_id.get(defuse_asset_id)
+
+    def by_contract(self, contract_address: str) -> Optional[TokenRecord]:
+        return self._index.by_contract.get(contract_address)
+
+    def __len__(self) -> int:
+        return len(self._index.records)
+
+
+_token_registry: Optional[TokenRegistry] = None
+_token_registry_lock = threading.Lock()
+
+
+def get_token_registry() -> TokenRegistry:
+    """Returns the process-wide registry, fed by the shared token catalog and the omni bridge."""
+    global _token_registry
+    with _token_registry_lock:
+        if _token_registry is None:
+            _token_registry = TokenRegistry()
+        return _token_registry
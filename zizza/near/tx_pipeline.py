@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+import base58
+import base64
+from near_api import transactions
+from near_api.providers import JsonProvider, JsonProviderError
+from near_api.serializer import BinarySerializer
+
+BLOCK_HASH_TTL = 30
+TX_POLL_INTERVAL = 1
+TX_OUTCOME_TIMEOUT = 120
+TX_STATUS_WORKERS = 8
+BROADCAST_TIMEOUT = 10
+# Times a transaction is re-signed after an InvalidNonce or Expired rejection
+MAX_RESUBMITS = 3
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionError(RuntimeError):
+    """A transaction was included but its execution failed; args[0] holds the Failure status."""
+
+
+class TransactionTimeoutError(TimeoutError):
+    pass
+
+
+def invalid_tx_error(error: Exception) -> Optional[dict]:
+    """Returns the InvalidTxError of a JSON-RPC error, e.g. {"InvalidNonce": {...}}, if it is one."""
+    try:
+        return error.args[0]['data']['TxExecutionError']['InvalidTxError']
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+def sign_transaction(signer, receiver_id: str, nonce: int, actions: list, block_hash: bytes) -> Tuple[str, bytes]:
+    """Signs a transaction, returning its base58 hash and its borsh serialized signed form."""
+    tx = transactions.Transaction()
+    tx.signerId = signer.account_id
+    tx.publicKey = transactions.PublicKey()
+    tx.publicKey.keyType = 0
+    tx.publicKey.data = signer.public_key
+    tx.nonce = nonce
+    tx.receiverId = receiver_id
+    tx.actions = actions
+    tx.blockHash = block_hash
+    tx_hash = hashlib.sha256(BinarySerializer(transactions.tx_schema).serialize(tx)).digest()
+    signature = transactions.Signature()
+    signature.keyType = 0
+    signature.data = signer.sign(tx_hash)
+    signed_tx = transactions.SignedTransaction()
+    signed_tx.transaction = tx
+    signed_tx.signature = signature
+    return base58.b58encode(tx_hash).decode('utf-8'), BinarySerializer(transactions.tx_schema).serialize(signed_tx)
+
+
+class _PendingTx:
+    __slots__ = ("pipeline", "future", "deadline", "next_poll")
+
+    def __init__(self, pipeline: "TxPipeline", future: Future, deadline: float):
+        self.pipeline = pipeline
+        self.future = future
+        self.deadline = deadline
+        # The tx RPC waits for the execution of a known transaction, so the first poll is immediate
+        self.next_poll = time.monotonic()
+
+
+class TxPipeline:
+    """Signs, broadcasts and tracks the transactions of one access key.
+
+    The access key nonce is fetched once and then incremented locally, and the block hash
+    referenced by transactions is cached for `block_hash_ttl` seconds, so a submission costs a
+    single broadcast round trip. Broadcasts do not wait for execution: outcomes are polled by the
+    background thread shared by every pipeline, so many transactions can be in flight at once. A
+    rejection for an invalid nonce or an expired block hash resyncs them and re-signs.
+    """
+
+    def __init__(self, provider: JsonProvider, signer, block_hash_ttl: float = BLOCK_HASH_TTL,
+                 poll_interval: float = TX_POLL_INTERVAL, timeout: float = TX_OUTCOME_TIMEOUT):
+        self.provider = provider
+        self.signer = signer
+        self.block_hash_ttl = block_hash_ttl
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._nonce: Optional[int] = None
+        self._block_hash: Optional[bytes] = None
+        self._block_hash_at = 0.0
+        self._send_tx_supported = True
+        # Held from nonce assignment to broadcast, so transactions reach the RPC in nonce order
+        self._submit_lock = threading.Lock()
+
+    @property
+    def account_id(self) -> str:
+        return self.signer.account_id
+
+    def submit(self, receiver_id: str, actions: list, timeout: float = None) -> Future:
+        """Broadcasts a transaction, returning a future resolved with its final execution outcome.
+
+        Raises:
+            JsonProviderError: If the RPC rejects the transaction, e.g. for NotEnoughBalance.
+        """
+        with self._submit_lock:
+            for attempt in range(MAX_RESUBMITS + 1):
+                tx_hash, signed_tx = sign_transaction(self.signer, receiver_id, self._next_nonce_locked(),
+                                                      actions, self._recent_block_hash())
+                try:
+                    self._broadcast(signed_tx)
+                    break
+                except JsonProviderError as e:
+                    error = invalid_tx_error(e)
+                    if attempt == MAX_RESUBMITS or not error or not ("InvalidNonce" in error or "Expired" in error):
+                        self._nonce = None
+                        raise
+                    if "InvalidNonce" in error:
+                        logger.info("nonce of %s out of sync, resyncing: %s", self.account_id, error["InvalidNonce"])
+                        self._nonce = int(error["InvalidNonce"]["ak_nonce"])
+                    else:
+                        self._block_hash = None
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        return _poller.track(tx_hash, _PendingTx(self, Future(), deadline))
+
+    def pending(self) -> int:
+        return _poller.pending(self)
+
+    def _next_nonce_locked(self) -> int:
+        if self._nonce is None:
+            access_key = self.provider.get_access_key(self.account_id, self.signer.key_pair.encoded_public_key())
+            self._nonce = int(access_key['nonce'])
+        self._nonce += 1
+        return self._nonce
+
+    def _recent_block_hash(self) -> bytes:
+        if self._block_hash is None or time.monotonic() - self._block_hash_at > self.block_hash_ttl:
+            block = self.provider.json_rpc('block', {"finality": "final"})
+            self._block_hash = base58.b58decode(block['header']['hash'].encode('utf8'))
+            self._block_hash_at = time.monotonic()
+        return self._block_hash
+
+    def _broadcast(self, signed_tx: bytes):
+        encoded = base64.b64encode(signed_tx).decode('utf8')
+        if self._send_tx_supported:
+            try:
+                # Validates the transaction, surfacing InvalidTxError, without waiting for it to execute
+                return self.provider.json_rpc('send_tx', {"signed_tx_base64": encoded, "wait_until": "NONE"},
+                                              timeout=BROADCAST_TIMEOUT)
+            except JsonProviderError as e:
+                if "METHOD_NOT_FOUND" not in str(e) and "Method not found" not in str(e):
+                    raise
+                self._send_tx_supported = False
+        return self.provider.json_rpc('broadcast_tx_async', [encoded], timeout=BROADCAST_TIMEOUT)
+
+    def _fetch_outcome(self, tx_hash: str) -> Optional[dict]:
+        try:
+            return self.provider.json_rpc('tx', [tx_hash, self.account_id], timeout=BROADCAST_TIMEOUT)
+        except JsonProviderError as e:
+            # Not included yet
+            logger.debug("transaction %s not found yet: %s", tx_hash, e)
+            return None
+        except Exception as e:
+            logger.warning("failed to fetch the outcome of transaction %s: %s", tx_hash, e)
+            return None
+
+
+class _OutcomePoller:
+    """Polls the outcome of the in-flight transactions of every pipeline from one background thread."""
+
+    def __init__(self, workers: int = TX_STATUS_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tx-status")
+        self._pending: Dict[str, _PendingTx] = {}
+        self._changed = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, tx_hash: str, entry: _PendingTx) -> Future:
+        with self._changed:
+            self._pending[tx_hash] = entry
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tx-outcome-poller", daemon=True)
+                self._thread.start()
+            self._changed.notify()
+            return entry.future
+
+    def pending(self, pipeline: "TxPipeline") -> int:
+        with self._changed:
+            return sum(1 for entry in self._pending.values() if entry.pipeline is pipeline)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while True:
+                    if not self._pending:
+                        self._changed.wait()
+                        continue
+                    now = time.monotonic()
+                    self._expire_locked(now)
+                    due = [(tx_hash, entry) for tx_hash, entry in self._pending.items() if entry.next_poll <= now]
+                    if due:
+                        break
+                    if self._pending:
+                        wake_at = min(min(entry.next_poll, entry.deadline) for entry in self._pending.values())
+                        self._changed.wait(max(wake_at - now, 0))
+            outcomes = list(self._executor.map(lambda item: item[1].pipeline._fetch_outcome(item[0]), due))
+            with self._changed:
+                now = time.monotonic()
+                for (tx_hash, entry), outcome in zip(due, outcomes):
+                    if self._pending.get(tx_hash) is not entry:
+                        continue
+                    status = (outcome or {}).get('status')
+                    if not isinstance(status, dict) or not ('SuccessValue' in status or 'Failure' in status):
+                        entry.next_poll = now + entry.pipeline.poll_interval
+                        continue
+                    del self._pending[tx_hash]
+                    if 'Failure' in status:
+                        entry.future.set_exception(TransactionError(status['Failure']))
+                    else:
+                        entry.future.set_result(outcome)
+
+    def _expire_locked(self, now: float):
+        for tx_hash in [tx_hash for tx_hash, entry in self._pending.items() if entry.deadline <= now]:
+            entry = self._pending.pop(tx_hash)
+            entry.future.set_exception(TransactionTimeoutError(f"no outcome for transaction {tx_hash} before the deadline"))
+
+
+_poller = _OutcomePoller()
+
+
+# Pipelines live as long as an account, or an in-flight transaction, uses them
+_pipelines: "weakref.WeakValueDictionary[tuple, TxPipeline]" = weakref.WeakValueDictionary()
+_pipelines_lock = threading.Lock()
+
+
+def get_tx_pipeline(provider: JsonProvider, signer) -> TxPipeline:
+    """Returns the pipeline of the signer's access key, shared by every account using the same key."""
+    key = (provider.rpc_addr(), signer.account_id, signer.key_pair.encoded_public_key())
+    with _pipelines_lock:
+        pipeline = _pipelines.get(key)
+        if not pipeline:
+            pipeline = _pipelines[key] = TxPipeline(provider, signer)
+        return pipeline
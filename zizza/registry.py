@@ -0,0 +1,160 @@
+"""
+Registry Module
+===============
+This module defines the `AgentRegistry` class, which keeps the live `Agent` instances keyed by
+session id so that a single process can serve many wallets.
+
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from .agent import Agent
+
+DEFAULT_SESSION = "default"
+MAX_AGENTS = 32
+AGENT_IDLE_TIMEOUT = 1800
+
+
+class AgentRegistry:
+    """
+    A thread-safe, session-keyed registry of agents.
+
+    Agents idle for longer than `idle_timeout` seconds are dropped, and once more than
+    `max_agents` are live the least recently used one is evicted. Dropped agents are closed.
+
+    A session is in use between `acquire` and `release`, e.g. while a batch runs on it. Sessions in
+    use are neither expired nor evicted, so `max_agents` may be exceeded while every agent is busy,
+    and an agent replaced or removed while its session is in use is closed once it is released.
+    """
+
+    def __init__(self, max_agents: int = MAX_AGENTS, idle_timeout: Optional[float] = AGENT_IDLE_TIMEOUT):
+        """
+        Args:
+            max_agents (int): The maximum number of live agents.
+            idle_timeout (float, optional): Seconds of inactivity after which an agent is dropped, None to keep it forever.
+        """
+        self.max_agents = max_agents
+        self.idle_timeout = idle_timeout
+        self._agents: "OrderedDict[str, tuple[Agent, float]]" = OrderedDict()
+        self._users: Dict[str, int] = {}
+        # Agents dropped while their session was in use, closed on its last release
+        self._deferred: Dict[str, List[Agent]] = {}
+        self._evicted = 0
+        self._expired = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Agent]:
+        """
+        Returns the agent of a session, marking it as recently used, or None if there is none.
+        """
+        with self._lock:
+            dropped = self._expire_locked()
+            entry = self._agents.get(session_id)
+            if entry:
+                self._agents[session_id] = (entry[0], time.monotonic())
+                self._agents.move_to_end(session_id)
+        self._close(dropped)
+        return entry[0] if entry else None
+
+    def put(self, session_id: str, agent: Agent):
+        """
+        Registers the agent of a session, replacing and closing any previous one.
+        """
+        with self._lock:
+            dropped = self._expire_locked()
+            previous = self._agents.pop(session_id, None)
+            if previous and previous[0] is not agent:
+                self._drop_locked(session_id, previous[0], dropped)
+            self._agents[session_id] = (agent, time.monotonic())
+            idle = [idle_id for idle_id in self._agents if idle_id not in self._users]
+            for evicted_id in idle[:max(len(self._agents) - self.max_agents, 0)]:
+                dropped.append(self._agents.pop(evicted_id)[0])
+                self._evicted += 1
+        self._close(dropped)
+
+    def remove(self, session_id: str):
+        dropped = []
+        with self._lock:
+            entry = self._agents.pop(session_id, None)
+            if entry:
+                self._drop_locked(session_id, entry[0], dropped)
+        self._close(dropped)
+
+    def acquire(self, session_id: str):
+        """
+        Marks a session as in use until the matching `release`.
+        """
+        with self._lock:
+            self._users[session_id] = self._users.get(session_id, 0) + 1
+
+    def release(self, session_id: str):
+        """
+        Ends a use of a session; its idle time starts once no use is left.
+        """
+        dropped = []
+        with self._lock:
+            self._users[session_id] -= 1
+            if not self._users[session_id]:
+                del self._users[session_id]
+                dropped = self._deferred.pop(session_id, [])
+                entry = self._agents.get(session_id)
+                if entry:
+                    self._agents[session_id] = (entry[0], time.monotonic())
+                    self._agents.move_to_end(session_id)
+        self._close(dropped)
+
+    @contextmanager
+    def use(self, session_id: str):
+        """
+        Keeps a session in use while the block runs.
+        """
+        self.acquire(session_id)
+        try:
+            yield
+        finally:
+            self.release(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._agents
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "agents": len(self._agents),
+                "in_use": len(self._users),
+                "max_agents": self.max_agents,
+                "evicted_lru": self._evicted,
+                "evicted_idle": self._expired,
+            }
+
+    def _expire_locked(self) -> list:
+        dropped = []
+        if self.idle_timeout is None:
+            return dropped
+        deadline = time.monotonic() - self.idle_timeout
+        for session_id, (agent, last_used) in list(self._agents.items()):
+            if last_used > deadline:
+                break
+            if session_id in self._users:
+                continue
+            del self._agents[session_id]
+            dropped.append(agent)
+            self._expired += 1
+        return dropped
+
+    def _drop_locked(self, session_id: str, agent: Agent, dropped: list):
+        if session_id in self._users:
+            self._deferred.setdefault(session_id, []).append(agent)
+        else:
+            dropped.append(agent)
+
+    @staticmethod
+    def _close(agents: list):
+        for agent in agents:
+            agent.close()
@@ -0,0 +1,241 @@
+"""
+Scheduler Module
+===============
+This module defines the `DagScheduler` class, which runs the operations of a batch as a
+dependency graph: independent reads run concurrently while state-changing operations stay
+serialized in their batch order.
+
+"""
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional
+from .executor import is_read_only
+
+ABORT = "abort"
+CONTINUE = "continue"
+SKIP_DEPENDENTS = "skip_dependents"
+FAILURE_POLICIES = (ABORT, CONTINUE, SKIP_DEPENDENTS)
+
+DAG_CONCURRENCY = 8
+
+
+class SchedulingError(ValueError):
+    pass
+
+
+class _Node:
+    __slots__ = ("index", "operation", "id", "read_only", "on_error", "depends_on", "after", "outcome", "result")
+
+    def __init__(self, index: int, operation: Dict[str, Any]):
+        self.index = index
+        self.operation = operation
+        self.id = operation.get("id")
+        read_only = operation.get("read_only")
+        self.read_only = is_read_only(operation.get("command")) if read_only is None else bool(read_only)
+        self.on_error = operation.get("on_error", ABORT)
+        # Explicit dependencies, whose failure may skip this node, and every node it must run after
+        self.depends_on: List[int] = []
+        self.after: set = set()
+        self.outcome: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+
+def _is_operation_id(value) -> bool:
+    return isinstance(value, (str, int)) and not isinstance(value, bool)
+
+
+def plan(operations: List[Dict[str, Any]]) -> List[_Node]:
+    """
+    Builds the dependency graph of a batch.
+
+    Each operation may set an `id`, the ids it `depends_on`, its `on_error` policy (`abort`,
+    `continue` or `skip_dependents`) and `read_only` to override the classification by command.
+    State-changing operations run after every operation preceding them in the batch, and reads
+    run after the last state-changing operation preceding them.
+
+    Raises:
+        SchedulingError: If an operation is malformed, an id is not a string or an integer, is
+            duplicated or unknown, or the declared dependencies contain a cycle, including an
+            operation depending on itself.
+    """
+    nodes = []
+    ids = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise SchedulingError(f"operation {index} is not an object")
+        node = _Node(index, operation)
+        if node.on_error not in FAILURE_POLICIES:
+            raise SchedulingError(f"operation {index} has an invalid on_error policy, use one of {', '.join(FAILURE_POLICIES)}")
+        if node.id is not None:
+            if not _is_operation_id(node.id):
+                raise SchedulingError(f"operation {index} has an invalid id, use a string or an integer")
+            if node.id in ids:
+                raise SchedulingError(f"duplicated operation id {node.id}")
+            ids[node.id] = index
+        nodes.append(node)
+
+    last_write = None
+    reads_since_write = []
+    for node in nodes:
+        depends_on = node.operation.get("depends_on", [])
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        for dependency in depends_on:
+            if not _is_operation_id(dependency):
+                raise SchedulingError(f"operation {node.index} has an invalid depends_on entry, use ids")
+            if dependency not in ids:
+                raise SchedulingError(f"operation {node.index} depends on unknown id {dependency}")
+            if ids[dependency] == node.index:
+                raise SchedulingError(f"dependency cycle between operations [{node.index}]")
+            node.depends_on.append(ids[dependency])
+        node.after.update(node.depends_on)
+        if node.read_only:
+            if last_write is not None:
+                node.after.add(last_write)
+            reads_since_write.append(node.index)
+        else:
+            if last_write is not None:
+                node.after.add(last_write)
+            node.after.update(reads_since_write)
+            last_write = node.index
+            reads_since_write = []
+        node.after.discard(node.index)
+
+    _check_acyclic(nodes)
+    return nodes
+
+
+def _check_acyclic(nodes: List[_Node]):
+    remaining = {node.index: set(node.after) for node in nodes}
+    while remaining:
+        free = [index for index, after in remaining.items() if not after & remaining.keys()]
+        if not free:
+            raise SchedulingError(f"dependency cycle between operations {sorted(remaining)}")
+        for index in free:
+            del remaining[index]
+
+
+class DagScheduler:
+    """
+    Runs a planned batch on an executor, starting each operation once everything it must run
+    after has finished.
+
+    A failed operation applies its `on_error` policy: `abort` stops scheduling and skips every
+    operation not started yet, `skip_dependents` skips the operations (transitively) depending
+    on it, and `continue` lets them run. Results are reported in batch order, each as soon as
+    all operations before it have been reported.
+
+    Scheduling is driven by completions, so no thread waits on the batch: an operation may
+    return a future (e.g. of an intent settlement), whose completion is handed back to the
+    executor without holding one of its threads meanwhile.
+    """
+
+    def __init__(self, nodes: List[_Node], run: Callable[[Dict[str, Any]], Any],
+                 on_result: Callable[[int, Dict[str, Any]], None], executor: Executor,
+                 on_progress: Callable[[int, int], None] = None):
+        """
+        Args:
+            nodes (list): The graph returned by `plan`.
+            run (Callable): Runs one operation, returning its result, or a future of it, or raising on failure.
+            on_result (Callable): Called as on_result(index, entry) in batch order.
+            executor (Executor): Runs the operations.
+            on_progress (Callable): Called as on_progress(finished, total) after each operation.
+        """
+        self.nodes = nodes
+        self.run = run
+        self.on_result = on_result
+        self.executor = executor
+        self.on_progress = on_progress
+        self.failed: List[int] = []
+        self.aborted_at: Optional[int] = None
+        self._reported = 0
+        self._pending = {node.index: node for node in nodes}
+        self._running = 0
+        self._on_finish: Optional[Callable[[], None]] = None
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    def execute(self):
+        """
+        Runs the batch, returning once every operation has an outcome.
+        """
+        self.start()
+        self._finished.wait()
+
+    def start(self, on_finish: Callable[[], None] = None):
+        """
+        Starts the operations ready to run and returns; `on_finish` is called once every operation has an outcome.
+        """
+        self._on_finish = on_finish
+        self._advance()
+
+    def _advance(self, node: _Node = None, future: Future = None):
+        with self._lock:
+            if node is not None:
+                self._running -= 1
+                self._record(node, future)
+            ready = self._schedule_locked()
+            self._report()
+            finished = not self._pending and not self._running and not self._finished.is_set()
+            if finished:
+                self._finished.set()
+        # submitted outside the lock: a callback of a future already done runs right away
+        for ready_node in ready:
+            self.executor.submit(self.run, ready_node.operation).add_done_callback(
+                lambda done, ready_node=ready_node: self._ran(ready_node, done))
+        if finished and self._on_finish:
+            self._on_finish()
+
+    def _ran(self, node: _Node, future: Future):
+        outcome = future.result() if future.exception() is None else None
+        if isinstance(outcome, Future) and not outcome.done():
+            # continue on the executor rather than in the thread resolving the outcome
+            outcome.add_done_callback(lambda done: self.executor.submit(self._advance, node, done))
+        else:
+            self._advance(node, outcome if isinstance(outcome, Future) else future)
+
+    def _schedule_locked(self) -> List[_Node]:
+        ready = []
+        for node in list(self._pending.values()):
+            if self.aborted_at is not None:
+                self._skip(node, f"aborted after operation {self.aborted_at + 1} failed")
+            elif any(self.nodes[dependency].outcome in ("skipped", "failed_skip") for dependency in node.depends_on):
+                self._skip(node, "a dependency failed")
+            elif all(self.nodes[dependency].outcome for dependency in node.after):
+                ready.append(node)
+            else:
+                continue
+            del self._pending[node.index]
+        self._running += len(ready)
+        if not self._running:
+            for node in self._pending.values():
+                self._skip(node, "its dependencies can never run")
+            self._pending.clear()
+        return ready
+
+    def _record(self, node: _Node, future: Future):
+        error = future.exception()
+        if error is None:
+            node.outcome = "done"
+            node.result = {"result": future.result()}
+        else:
+            node.outcome = "failed_skip" if node.on_error == SKIP_DEPENDENTS else "failed"
+            node.result = {"error": str(error)}
+            self.failed.append(node.index)
+            if node.on_error == ABORT and self.aborted_at is None:
+                self.aborted_at = node.index
+
+    def _skip(self, node: _Node, reason: str):
+        node.outcome = "skipped"
+        node.result = {"error": f"skipped: {reason}", "skipped": True}
+
+    def _report(self):
+        while self._reported < len(self.nodes) and self.nodes[self._reported].outcome:
+            node = self.nodes[self._reported]
+            entry = {"command": node.operation.get("command"), "params": node.operation.get("params", {})}
+            if node.id is not None:
+                entry["id"] = node.id
+            self.on_result(node.index, {**entry, **node.result})
+            self._reported += 1
+        if self.on_progress:
+            self.on_progress(sum(1 for node in self.nodes if node.outcome), len(self.nodes))
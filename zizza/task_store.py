@@ -0,0 +1,249 @@
+"""
+Task Store Module
+===============
+This module defines the `TaskStore` class, the bounded in-memory store holding the status and
+results of the batches submitted to the server, and the ordered event log streamed to clients
+following a task.
+
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TASK_TTL = 3600
+TASK_STORE_MAX_ENTRIES = 10000
+TASK_STORE_MAX_BYTES = 64 * 1024 * 1024
+
+# Rough fixed overhead of a task entry, added to its results size when budgeting bytes.
+TASK_OVERHEAD_BYTES = 256
+# Rough overhead of an event log entry; result events point to the stored result instead of copying it.
+EVENT_OVERHEAD_BYTES = 64
+
+STATUS_EVENT = "status"
+RESULT_EVENT = "result"
+END_EVENT = "end"
+
+
+class _Task:
+    __slots__ = ("status", "results", "events", "listeners", "size", "finished_at")
+
+    def __init__(self, status: str):
+        self.status = status
+        self.results: List[bytes] = []
+        # (kind, status or result index); an event id is its position in the log, starting from 1
+        self.events: List[Tuple[str, Any]] = [(STATUS_EVENT, status)]
+        self.listeners: List[Callable[[], None]] = []
+        self.size = TASK_OVERHEAD_BYTES + EVENT_OVERHEAD_BYTES
+        self.finished_at: Optional[float] = None
+
+
+class TaskStore:
+    """
+    A thread-safe task store bounded by entry count and byte budget.
+
+    Results are kept as compact JSON bytes. Finished tasks expire `ttl` seconds after they
+    complete or fail; when the store is over budget the least recently used finished tasks
+    are evicted first. Running tasks are never evicted.
+
+    Every status change and result is also appended to the task's event log, which
+    `events` reads from any event id and `subscribe` listeners are notified about.
+    """
+
+    def __init__(self, ttl: float = TASK_TTL, max_entries: int = TASK_STORE_MAX_ENTRIES,
+                 max_bytes: int = TASK_STORE_MAX_BYTES):
+        """
+        Args:
+            ttl (float): Seconds a finished task is kept after completion.
+            max_entries (int): The maximum number of tasks kept.
+            max_bytes (int): The approximate memory budget for task results, in bytes.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._tasks: "OrderedDict[str, _Task]" = OrderedDict()
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._bytes = 0
+        self._evicted_expired = 0
+        self._evicted_lru = 0
+        self._lock = threading.Lock()
+
+    def create(self, task_id: str, status: str = "Pending"):
+        with self._lock:
+            task = _Task(status)
+            self._tasks[task_id] = task
+            self._bytes += task.size
+            self._evict_locked()
+
+    def delete(self, task_id: str):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            self._remove_locked(task_id)
+        self._notify(task)
+
+    def set_status(self, task_id: str, status: str):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task or task.status == status:
+                return
+            task.status = status
+            self._record_locked(task, STATUS_EVENT, status)
+        self._notify(task)
+
+    def append_result(self, task_id: str, result: Dict[str, Any]):
+        encoded = json.dumps(result, separators=(',', ':'), default=str).encode('utf-8')
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task:
+                return
+            task.results.append(encoded)
+            task.size += len(encoded)
+            self._bytes += len(encoded)
+            self._record_locked(task, RESULT_EVENT, len(task.results) - 1)
+            self._evict_locked()
+        self._notify(task)
+
+    def finish(self, task_id: str, status: str):
+        """
+        Sets the final status of a task and starts its expiry countdown.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task:
+                return
+            task.status = status
+            task.finished_at = time.monotonic()
+            self._finished[task_id] = task.finished_at
+            self._record_locked(task, END_EVENT, status)
+            self._evict_locked()
+        self._notify(task)
+
+    def get(self, task_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"status": str, "results": list} for a task, or None if unknown or evicted.
+
+        When `offset` or `limit` is given only that page of results is decoded and
+        "total_results" is included in the response.
+        """
+        with self._lock:
+            self._expire_locked()
+            task = self._tasks.get(task_id)
+            if not task:
+                return None
+            self._tasks.move_to_end(task_id)
+            status = task.status
+            paginated = offset > 0 or limit is not None
+            end = None if limit is None else offset + limit
+            page = task.results[offset:end]
+            total = len(task.results)
+        response = {"status": status, "results": [json.loads(result) for result in page]}
+        if paginated:
+            response["total_results"] = total
+        return response
+
+    def events(self, task_id: str, after: int = 0) -> Optional[Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]]:
+        """
+        Returns ([(event_id, kind, data), ...], finished) with the events logged after event id
+        `after`, or None if the task is unknown or evicted.
+
+        Kinds are "status" ({"status"}), "result" ({"index", "command", "params", "result" or
+        "error"}) and "end" ({"status", "total_results"}), always the last event of a task.
+        """
+        with self._lock:
+            self._expire_locked()
+            task = self._tasks.get(task_id)
+            if not task:
+                return None
+            events = task.events[max(after, 0):]
+            results = {payload: task.results[payload] for kind, payload in events if kind == RESULT_EVENT}
+            total = len(task.results)
+            finished = task.finished_at is not None
+        decoded = []
+        for event_id, (kind, payload) in enumerate(events, start=max(after, 0) + 1):
+            if kind == RESULT_EVENT:
+                data = {"index": payload, **json.loads(results[payload])}
+            elif kind == END_EVENT:
+                data = {"status": payload, "total_results": total}
+            else:
+                data = {"status": payload}
+            decoded.append((event_id, kind, data))
+        return decoded, finished
+
+    def subscribe(self, task_id: str, listener: Callable[[], None]) -> bool:
+        """
+        Calls `listener` after every new event of the task, and when it is deleted. The listener
+        runs on the thread updating the task, so it must be quick. Returns False if the task is unknown.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task:
+                return False
+            task.listeners.append(listener)
+            return True
+
+    def unsubscribe(self, task_id: str, listener: Callable[[], None]):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task and listener in task.listeners:
+                task.listeners.remove(listener)
+
+    def __contains__(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire_locked()
+            return {
+                "entries": len(self._tasks),
+                "running": len(self._tasks) - len(self._finished),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evicted_expired": self._evicted_expired,
+                "evicted_lru": self._evicted_lru,
+            }
+
+    def _record_locked(self, task: _Task, kind: str, payload: Any):
+        task.events.append((kind, payload))
+        task.size += EVENT_OVERHEAD_BYTES
+        self._bytes += EVENT_OVERHEAD_BYTES
+
+    @staticmethod
+    def _notify(task: Optional[_Task]):
+        if not task:
+            return
+        for listener in list(task.listeners):
+            try:
+                listener()
+            except Exception:
+                pass
+
+    def _remove_locked(self, task_id: str):
+        task = self._tasks.pop(task_id, None)
+        if task:
+            self._bytes -= task.size
+            self._finished.pop(task_id, None)
+
+    def _expire_locked(self):
+        deadline = time.monotonic() - self.ttl
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > deadline:
+                break
+            self._remove_locked(task_id)
+            self._evicted_expired += 1
+
+    def _evict_locked(self):
+        self._expire_locked()
+        if len(self._tasks) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        for task_id in [task_id for task_id in self._tasks if task_id in self._finished]:
+            if len(self._tasks) <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            self._remove_locked(task_id)
+            self._evicted_lru += 1
@@ -0,0 +1,91 @@
+"""
+Transport Module
+===============
+This module defines the `HTTPTransport` class, the shared HTTP client used by every backend client
+(solver relay, NEAR RPC, omni bridge and token catalog).
+
+"""
+import threading
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2  # noqa: F401, required by httpx for HTTP/2
+except ImportError:
+    httpx = None
+
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 32
+HTTP_TIMEOUT = 30
+
+
+class HTTPTransport:
+    """
+    A thread-safe HTTP client keeping a pool of keep-alive connections per host.
+
+    HTTP/2 is used when `httpx` and `h2` are installed, otherwise requests are sent over
+    pooled HTTP/1.1 connections of a `requests.Session`. Responses of both backends expose
+    `status_code`, `headers`, `content`, `json()` and `raise_for_status()`.
+    """
+
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 timeout: float = HTTP_TIMEOUT, http2: bool = True):
+        """
+        Args:
+            pool_connections (int): The number of hosts to keep connection pools for.
+            pool_maxsize (int): The maximum number of connections kept per host.
+            timeout (float): The default timeout of a call, in seconds.
+            http2 (bool): Whether to use HTTP/2 when available.
+        """
+        self.timeout = timeout
+        self.http2 = bool(http2 and httpx)
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_connections * pool_maxsize,
+                                    max_keepalive_connections=pool_maxsize),
+                timeout=timeout,
+            )
+        else:
+            self._client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            self._client.mount("http://", adapter)
+            self._client.mount("https://", adapter)
+
+    def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs):
+        return self._client.request(method, url, timeout=timeout or self.timeout, **kwargs)
+
+    def get(self, url: str, timeout: Optional[float] = None, **kwargs):
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def post(self, url: str, timeout: Optional[float] = None, **kwargs):
+        return self.request("POST", url, timeout=timeout, **kwargs)
+
+    def close(self):
+        self._client.close()
+
+
+_transport: Optional[HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """
+    Returns the process-wide transport, creating it with the default settings on first use.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HTTPTransport()
+        return _transport
+
+
+def set_transport(transport: HTTPTransport):
+    """
+    Replaces the process-wide transport, e.g. to change pool sizes or timeouts.
+    """
+    global _transport
+    with _transport_lock:
+        _transport = transport
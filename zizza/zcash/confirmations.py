@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+TIP_POLL_INTERVAL = 5
+TX_CONFIRMATION_TIMEOUT = 1800
+
+logger = logging.getLogger(__name__)
+
+
+class TxConfirmationTimeoutError(TimeoutError):
+    pass
+
+
+class _PendingTx:
+    __slots__ = ("future", "deadline")
+
+    def __init__(self, future: Future, deadline: float):
+        self.future = future
+        self.deadline = deadline
+
+
+class ConfirmationWatcher:
+    """Waits for the confirmation of many Zcash transactions from a single background thread.
+
+    Every `poll_interval` seconds only the chain tip is queried with `get_tip`. The wallet is
+    synced and its history listed once per new block, and every pending transaction found
+    in a mined block is resolved at once. A transaction's future resolves to the height of
+    its block, or to TxConfirmationTimeoutError after its deadline.
+    """
+
+    def __init__(self, get_tip: Callable[[], int], sync: Callable[[], bool], list_transactions: Callable[[], List[dict]],
+                 poll_interval: float = TIP_POLL_INTERVAL, timeout: float = TX_CONFIRMATION_TIMEOUT):
+        self.get_tip = get_tip
+        self.sync = sync
+        self.list_transactions = list_transactions
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._pending: Dict[str, _PendingTx] = {}
+        self._scanned_tip: Optional[int] = None
+        self._rescan = False
+        self._changed = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, txid: str, timeout: Optional[float] = None) -> Future:
+        """Starts watching a transaction, returning a future resolved with its block height."""
+        with self._changed:
+            if self._stopped:
+                raise RuntimeError("confirmation watcher is stopped")
+            entry = self._pending.get(txid)
+            if entry:
+                return entry.future
+            deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+            entry = self._pending[txid] = _PendingTx(Future(), deadline)
+            # The transaction may already be mined, so the next cycle scans even without a new block
+            self._rescan = True
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="zcash-confirmation-watcher", daemon=True)
+                self._thread.start()
+            self._changed.notify()
+            return entry.future
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stop(self):
+        """Stops the watcher, failing the transactions still pending."""
+        with self._changed:
+            self._stopped = True
+            for txid in list(self._pending):
+                self._pending.pop(txid).future.set_exception(RuntimeError(f"stopped watching {txid}"))
+            self._changed.notify()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._stopped and not self._pending:
+                    self._changed.wait()
+                if self._stopped:
+                    return
+                rescan, self._rescan = self._rescan, False
+            try:
+                tip = self.get_tip()
+                if rescan or tip is None or tip != self._scanned_tip:
+                    self.sync()
+                    self._resolve_mined(self.list_transactions())
+                    self._scanned_tip = tip
+            except Exception as e:
+                self._rescan = self._rescan or rescan
+                logger.warning("failed to check %d zcash transactions: %s", len(self._pending), e)
+            with self._changed:
+                self._expire_locked(time.monotonic())
+                if self._pending and not self._stopped:
+                    wake_at = min(time.monotonic() + self.poll_interval,
+                                  min(entry.deadline for entry in self._pending.values()))
+                    self._changed.wait(max(wake_at - time.monotonic(), 0))
+
+    def _resolve_mined(self, transactions: List[dict]):
+        mined = {tx.get('txid'): tx.get('block_height') for tx in transactions if not tx.get('unconfirmed')}
+        with self._changed:
+            for txid in [txid for txid in self._pending if txid in mined]:
+                self._pending.pop(txid).future.set_result(mined[txid])
+
+    def _expire_locked(self, now: float):
+        for txid in [txid for txid, entry in self._pending.items() if entry.deadline <= now]:
+            entry = self._pending.pop(txid)
+            entry.future.set_exception(TxConfirmationTimeoutError(f"zcash tx {txid} not confirmed before the deadline"))
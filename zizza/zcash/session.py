@@ -0,0 +1,221 @@
+import codecs
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import List, Optional
+import regex
+
+# zecwallet-cli may print this prompt after every response in interactive mode,
+# e.g. "(main) Block:2765432 (type 'help') >> ", but not when stdin is not a terminal
+PROMPT_PATTERN = regex.compile(r"\([a-z]+\) Block:\d* \(type 'help'\) >> ")
+# Sent at startup: the session is ready once its {"height": N} answer is read
+STARTUP_PROBE = "height"
+STARTUP_PROBE_PATTERN = regex.compile(r'"height"\s*:')
+STARTUP_TIMEOUT = 120
+COMMAND_TIMEOUT = 60
+HEALTH_CHECK_TIMEOUT = 10
+SHUTDOWN_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+class WalletSessionError(RuntimeError):
+    pass
+
+
+def _json_end(text: str, start: int) -> Optional[int]:
+    """Returns the index past the JSON object or array opened at `start`, or None if it is not closed yet."""
+    depth = 0
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return None
+
+
+def find_json_end(text: str) -> Optional[int]:
+    """Returns the index past the first complete JSON object or array of `text`, skipping any other output."""
+    start = 0
+    while True:
+        match = regex.search(r'[\{\[]', text[start:])
+        if not match:
+            return None
+        begin = start + match.start()
+        end = _json_end(text, begin)
+        if end is None:
+            return None
+        try:
+            json.loads(text[begin:end])
+            return end
+        except ValueError:
+            # bracketed log output, e.g. "[INFO] ..."
+            start = begin + 1
+
+
+class WalletSession:
+    """A long-lived interactive zecwallet-cli process.
+
+    Commands are written to stdin one per line. Every command used prints a JSON
+    document, so a response ends with the first complete JSON object or array; when
+    the CLI also prints its interactive prompt, the prompt ends non-JSON responses
+    and is otherwise skipped. Requests are serialized by a lock; a process that
+    exits, hangs or breaks the pipe is killed and transparently restarted on the
+    next command.
+    """
+
+    def __init__(self, args: List[str], command_timeout: float = COMMAND_TIMEOUT,
+                 startup_timeout: float = STARTUP_TIMEOUT):
+        self.args = args
+        self.command_timeout = command_timeout
+        self.startup_timeout = startup_timeout
+        self.restarts = 0
+        self._started = False
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._output = threading.Condition()
+        self._buffer = ""
+        self._eof = False
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def execute(self, command: str, timeout: float = None) -> str:
+        """Runs a single command and returns its raw output."""
+        if "\n" in command:
+            raise ValueError("zecwallet-cli commands must fit on a single line")
+        with self._lock:
+            if not self.is_alive():
+                self._start_locked()
+            try:
+                self._process.stdin.write((command + "\n").encode('utf-8'))
+                self._process.stdin.flush()
+                return self._read_frame_locked(timeout or self.command_timeout)
+            except (OSError, WalletSessionError) as e:
+                self._kill_locked()
+                raise WalletSessionError(f"zecwallet-cli session failed running '{command.split(' ')[0]}': {e}")
+
+    def health_check(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+        """Pings the CLI with a cheap command, restarting it if it does not answer."""
+        try:
+            self.execute("height", timeout=timeout)
+            return True
+        except WalletSessionError:
+            logger.warning("zecwallet-cli session unhealthy, restarting")
+            try:
+                with self._lock:
+                    self._start_locked()
+                return True
+            except WalletSessionError:
+                return False
+
+    def close(self):
+        with self._lock:
+            if not self.is_alive():
+                return
+            try:
+                # quit saves the wallet before exiting
+                self._process.stdin.write(b"quit\n")
+                self._process.stdin.flush()
+                self._process.wait(timeout=SHUTDOWN_TIMEOUT)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self._kill_locked()
+
+    def _start_locked(self):
+        self._kill_locked()
+        if self._started:
+            self.restarts += 1
+        self._started = True
+        with self._output:
+            self._buffer = ""
+            self._eof = False
+        self._process = subprocess.Popen(self.args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        threading.Thread(target=self._pump, args=(self._process,), name="zecwallet-cli-reader", daemon=True).start()
+        deadline = time.monotonic() + self.startup_timeout
+        try:
+            # the startup output varies (banner, sync logs, a prompt or not), so wait for the answer to a probe
+            self._process.stdin.write((STARTUP_PROBE + "\n").encode('utf-8'))
+            self._process.stdin.flush()
+            while not STARTUP_PROBE_PATTERN.search(self._read_frame_locked(max(deadline - time.monotonic(), 0))):
+                pass
+        except (OSError, WalletSessionError) as e:
+            self._kill_locked()
+            raise WalletSessionError(f"zecwallet-cli failed to start: {e}")
+
+    def _pump(self, process: subprocess.Popen):
+        fd = process.stdout.fileno()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                chunk = b""
+            with self._output:
+                if process is not self._process:
+                    return
+                if not chunk:
+                    self._eof = True
+                    self._output.notify_all()
+                    return
+                self._buffer += decoder.decode(chunk)
+                self._output.notify_all()
+
+    def _read_frame_locked(self, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        with self._output:
+            while True:
+                frame = self._take_frame_locked()
+                if frame is not None:
+                    return frame
+                if self._eof:
+                    raise WalletSessionError(f"zecwallet-cli exited: {self._buffer.strip()}")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WalletSessionError(f"no response from zecwallet-cli within {timeout}s")
+                self._output.wait(remaining)
+
+    def _take_frame_locked(self) -> Optional[str]:
+        """Removes the next response from the buffer, or returns None if it is not complete yet."""
+        while True:
+            prompt = PROMPT_PATTERN.search(self._buffer)
+            limit = prompt.start() if prompt else len(self._buffer)
+            end = find_json_end(self._buffer[:limit])
+            if end is not None:
+                frame, self._buffer = self._buffer[:end], self._buffer[end:]
+                return frame
+            if not prompt:
+                return None
+            frame, self._buffer = self._buffer[:prompt.start()], self._buffer[prompt.end():]
+            if frame.strip():
+                return frame
+            # the prompt printed after a JSON response
+
+    def _kill_locked(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
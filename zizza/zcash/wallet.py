@@ -1,32 +1,199 @@
+import fcntl
 import subprocess
 import json
 import regex
 import os
-from time import sleep
+import hashlib
+import shutil
+import threading
+import time
+from typing import Dict, Optional
 import bip39
+from .session import WalletSession
+from ..executor import signing_slot
+from ..metrics import BACKEND_ERRORS, BACKEND_LATENCY, observe
+from .confirmations import ConfirmationWatcher
 
-ZCASH_RPC_LIGHTNODE_URL = "https://zec.rocks:443"
+ZCASH_RPC_LIGHTNODE_URL = os.getenv("ZIZZA_ZCASH_SERVER", "https://zec.rocks:443")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-ZEC_LITE_BIN = os.path.join(BASE_DIR, "zecwallet-light-cli", "target", "release", "zecwallet-cli")
-ZEC_LITE_WALLET_DATADIR = os.path.join(BASE_DIR, "data")
+ZEC_LITE_BIN = os.getenv("ZIZZA_ZEC_LITE_BIN", os.path.join(BASE_DIR, "zecwallet-light-cli", "target", "release", "zecwallet-cli"))
+ZEC_LITE_WALLET_DATADIR = os.getenv("ZIZZA_ZEC_DATA_DIR", os.path.join(BASE_DIR, "data"))
+ZEC_LITE_WALLET_FILE = "zecwallet-light-wallet.dat"
+# Written once a wallet has been fully recovered, holding the birthday it was scanned from;
+# only such wallet directories are reused
+RECOVERED_MARKER = ".recovered"
+# Locked by the ZcashWallet using the directory, so that no other one nor cleanup_wallet_dirs touches it
+WALLET_LOCK_FILE = ".lock"
+# Seconds to wait for a wallet directory held by another process, or being cleaned up
+WALLET_LOCK_TIMEOUT = 5
+WALLET_DIR_MAX_AGE = 30 * 24 * 3600
+MAX_WALLET_DIRS = 256
+WALLET_DIR_PATTERN = regex.compile(r"^[0-9a-f]{32}$")
 
 def is_valid_address(address: str) -> bool:
     return bool(regex.fullmatch(r"^[a-zA-Z0-9]{34,}$", address))
 
+def wallet_fingerprint(mnemonics: str) -> str:
+    """Derives a stable, non-reversible directory name from a seed phrase."""
+    normalized = " ".join(mnemonics.split()).lower()
+    return hashlib.sha256(f"zizza-zcash-wallet:{normalized}".encode('utf-8')).hexdigest()[:32]
+
+def lock_wallet_dir(wallet_dir: str, timeout: float = WALLET_LOCK_TIMEOUT):
+    """Creates `wallet_dir` if needed and locks it exclusively, until the returned file is closed.
+
+    Raises:
+        RuntimeError: If the directory is still locked by another wallet after `timeout` seconds.
+    """
+    path = os.path.join(wallet_dir, WALLET_LOCK_FILE)
+    deadline = time.monotonic() + timeout
+    while True:
+        os.makedirs(wallet_dir, exist_ok=True)
+        lock = open(path, "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Zcash wallet {os.path.basename(wallet_dir)} is open in another process")
+            time.sleep(0.1)
+            continue
+        try:
+            if os.stat(path).st_ino == os.fstat(lock.fileno()).st_ino:
+                return lock
+        except FileNotFoundError:
+            pass
+        # removed by cleanup_wallet_dirs while waiting for the lock
+        lock.close()
+
+def recovered_birthday(wallet_dir: str) -> Optional[int]:
+    """Returns the birthday a wallet directory was recovered from, or None if it is not fully recovered."""
+    try:
+        with open(os.path.join(wallet_dir, RECOVERED_MARKER)) as f:
+            birthday = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    return birthday if os.path.exists(os.path.join(wallet_dir, ZEC_LITE_WALLET_FILE)) else None
+
+def _remove_unused_wallet_dir(path: str) -> bool:
+    """Removes a wallet directory unless a ZcashWallet holds its lock."""
+    try:
+        lock = open(os.path.join(path, WALLET_LOCK_FILE), "a")
+    except OSError:
+        return False
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+def cleanup_wallet_dirs(data_dir: str, max_age: float = WALLET_DIR_MAX_AGE, max_wallets: int = MAX_WALLET_DIRS, keep=()) -> list:
+    """Removes per-wallet directories unused for more than `max_age` seconds, and the least
+    recently used ones beyond `max_wallets`, skipping those open in a ZcashWallet of any process.
+    Returns the removed directory names."""
+    try:
+        names = [name for name in os.listdir(data_dir)
+                 if WALLET_DIR_PATTERN.match(name) and name not in keep and os.path.isdir(os.path.join(data_dir, name))]
+    except FileNotFoundError:
+        return []
+    last_used = sorted(((os.path.getmtime(os.path.join(data_dir, name)), name) for name in names), reverse=True)
+    now = time.time()
+    max_kept = max(max_wallets - len(keep), 0)
+    removed = []
+    for index, (mtime, name) in enumerate(last_used):
+        if (now - mtime > max_age or index >= max_kept) and _remove_unused_wallet_dir(os.path.join(data_dir, name)):
+            removed.append(name)
+    return removed
+
+_open_wallets: Dict[tuple, "ZcashWallet"] = dict()
+_open_wallets_lock = threading.Lock()
+_opening_locks: Dict[tuple, threading.Lock] = dict()
+
+def open_wallet(mnemonics: Optional[str], birthday=None, server=ZCASH_RPC_LIGHTNODE_URL, data_dir=ZEC_LITE_WALLET_DATADIR) -> "ZcashWallet":
+    """Returns the wallet of a seed, shared by every agent of the process using it, as a wallet
+    directory is only opened by one zecwallet-cli at a time. Each call must be matched by a `close`
+    of the returned wallet; the last one closes it."""
+    if not mnemonics:
+        return ZcashWallet(birthday=birthday, server=server, data_dir=data_dir)
+    key = (os.path.abspath(data_dir), wallet_fingerprint(mnemonics))
+    with _open_wallets_lock:
+        opening_lock = _opening_locks.setdefault(key, threading.Lock())
+    with opening_lock:
+        with _open_wallets_lock:
+            wallet = _open_wallets.get(key)
+            if wallet:
+                if birthday and int(birthday) < wallet.birthday:
+                    raise ValueError(f"the Zcash wallet is open in another session, scanned from birthday {wallet.birthday}: close it to rescan from {birthday}")
+                wallet._users += 1
+                return wallet
+        wallet = ZcashWallet(mnemonics=mnemonics, birthday=birthday, server=server, data_dir=data_dir)
+        with _open_wallets_lock:
+            wallet._shared_key = key
+            _open_wallets[key] = wallet
+        return wallet
+
 class ZcashWallet:
     def __init__(self, mnemonics=None, birthday=None, server=ZCASH_RPC_LIGHTNODE_URL, data_dir=ZEC_LITE_WALLET_DATADIR):
+        """With mnemonics, the wallet lives in its own directory under `data_dir`, named after the
+        seed fingerprint, which it locks while open. A wallet recovered earlier from the same or an
+        earlier birthday is reused and only synced incrementally."""
         if not os.path.exists(ZEC_LITE_BIN):
             raise RuntimeError("zecwallet-cli missing, compile zecwallet-cli first")
-        self.configs = f"--server \"{server}\" --data-dir {data_dir}"
         self.pattern = regex.compile(r'[\{|\[](?:[^{}]|(?R))*[\}|\]]')  
-        if mnemonics:
-            if not birthday:
-                birthday = 1
-            wallet_path = os.path.join(data_dir, "zecwallet-light-wallet.dat")
-            if os.path.exists(wallet_path):
-                os.remove(wallet_path)
+        fingerprint = wallet_fingerprint(mnemonics) if mnemonics else None
+        self.wallet_dir = os.path.join(data_dir, fingerprint) if fingerprint else data_dir
+        self.configs = f"--server \"{server}\" --data-dir {self.wallet_dir}"
+        self.birthday = int(birthday) if birthday else 1
+        reused = True
+        self._lock = self._session = self._watcher = None
+        self._users = 1
+        self._shared_key = None
+        try:
+            if mnemonics:
+                self._lock = lock_wallet_dir(self.wallet_dir)
+                scanned_from = recovered_birthday(self.wallet_dir)
+                reused = scanned_from is not None and scanned_from <= self.birthday
+                if reused:
+                    self.birthday = scanned_from
+                else:
+                    for name in os.listdir(self.wallet_dir):
+                        if name == WALLET_LOCK_FILE:
+                            continue
+                        path = os.path.join(self.wallet_dir, name)
+                        if os.path.isdir(path):
+                            shutil.rmtree(path, ignore_errors=True)
+                        else:
+                            os.remove(path)
+                    self._recover_wallet(mnemonics=mnemonics, birthday=self.birthday)
+                    with open(os.path.join(self.wallet_dir, RECOVERED_MARKER), "w") as f:
+                        f.write(str(self.birthday))
+                os.utime(self.wallet_dir)
+                cleanup_wallet_dirs(data_dir, keep=(fingerprint,))
+            self._session = WalletSession([ZEC_LITE_BIN, "--server", server, "--data-dir", self.wallet_dir])
+            self._watcher = ConfirmationWatcher(get_tip=self._chain_tip, sync=self._sync, list_transactions=self._list)
+            if mnemonics and reused:
+                # Catch up from the last scanned height of the existing wallet file
+                self._sync()
+        except BaseException:
+            self.close()
+            raise
 
-            self._recover_wallet(mnemonics=mnemonics, birthday=birthday)
+    def close(self):
+        """Saves the wallet, stops the zecwallet-cli session and unlocks the wallet directory; a wallet
+        shared by `open_wallet` is only closed by its last user."""
+        with _open_wallets_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            if _open_wallets.get(self._shared_key) is self:
+                del _open_wallets[self._shared_key]
+        if self._watcher:
+            self._watcher.stop()
+        if self._session:
+            self._session.close()
+        if self._lock:
+            self._lock.close()
 
     def get_balance(self) -> float:
         balance = self._balance()
@@ -58,7 +225,18 @@ class ZcashWallet:
         if not is_valid_address(address=to):
             raise ValueError("invalid address")
         payload = f"send {to} {int(value * 10 ** 8)}"
-        return self._run_command(payload).get('txid')
+        with signing_slot():
+            return self._run_command(payload).get('txid')
+    
+    def send_many(self, recipients: list):
+        """Sends to several (address, value) recipients in a single transaction."""
+        for to, _ in recipients:
+            if not is_valid_address(address=to):
+                raise ValueError(f"invalid address {to}")
+        outputs = json.dumps([{"address": to, "amount": int(value * 10 ** 8)} for to, value in recipients], separators=(',', ':'))
+        payload = f"send '{outputs}'"
+        with signing_slot():
+            return self._run_command(payload).get('txid')
     
     def shield(self, to:str):
         if not is_valid_address(address=to):
@@ -66,7 +244,8 @@ class ZcashWallet:
         if to.startswith('t'):
             raise ValueError("invalid shield address")
         payload = f"shield {to}"
-        return self._run_command(payload).get('txid')
+        with signing_slot():
+            return self._run_command(payload).get('txid')
     
     def default_fee(self) -> float:
         return self._run_command("defaultfee").get("defaultfee") / 10 ** 8
@@ -74,20 +253,28 @@ class ZcashWallet:
     def _is_valid_address(address: str) -> bool:
         return bool(regex.fullmatch(r"^[a-zA-Z0-9]+$", address))
 
-    def _run_command(self, args: list):
+    def _run_command(self, args: str):
+        with observe(BACKEND_LATENCY, BACKEND_ERRORS, backend="zcash_cli", call=args.split(" ", 1)[0]):
+            return self._parse_output(self._session.execute(args))
+
+    def _run_oneshot_command(self, args: str):
+        """Runs a command in a dedicated zecwallet-cli process, needed when it takes CLI flags."""
         process = subprocess.run(f'{ZEC_LITE_BIN} {self.configs} {args}',
             check=True, stdout=subprocess.PIPE, universal_newlines=True, shell=True
         )
-        output_json = self.pattern.findall(process.stdout)
+        return self._parse_output(process.stdout)
+
+    def _parse_output(self, output: str):
+        output_json = self.pattern.findall(output)
         try:
             return [json.loads(output_json[i]) for i in range(len(output_json))] if len(output_json) > 1 else json.loads(output_json[0])
         except Exception:
-            raise RuntimeError(f"Error parsing zecwallet-cli JSON output: {process.stdout}")
+            raise RuntimeError(f"Error parsing zecwallet-cli JSON output: {output}")
 
     def _recover_wallet(self, mnemonics, birthday):
         if not bip39.check_phrase(phrase=mnemonics):
             raise ValueError("invalid mnemonic phrase")
-        return self._run_command(f"balance --seed \"{mnemonics}\" --birthday {birthday}")
+        return self._run_oneshot_command(f"balance --seed \"{mnemonics}\" --birthday {birthday}")
 
     def _sync(self):
         return True if self._run_command("sync").get("result") == "success" else False
@@ -104,14 +291,17 @@ class ZcashWallet:
     def _balance(self):
         return self._run_command("balance")
 
-    def _is_tx_confirmed(self, tx_hash):
-        try:
-            self._sync()
-            return not next(filter(lambda x: x.get('txid') == tx_hash, self._run_command("list"))).get("unconfirmed")
-        except StopIteration:
-            return False
-    def wait_tx_confirmed(self, tx_hash) -> bool:
-        while not self._is_tx_confirmed(tx_hash=tx_hash):
-            print(f"waiting {tx_hash} to be confirmed...")
-            sleep(2)
-        return True
\ No newline at end of file
+    def _chain_tip(self):
+        # Asks the lightwalletd server for its latest block, "height" is only the wallet's synced height
+        return self._info().get("latest_block_height")
+
+    def _list(self):
+        return self._run_command("list")
+
+    def track_tx(self, tx_hash, timeout=None):
+        """Returns a future resolved with the block height of the transaction once it is mined."""
+        return self._watcher.watch(tx_hash, timeout=timeout)
+
+    def wait_tx_confirmed(self, tx_hash, timeout=None) -> bool:
+        self.track_tx(tx_hash, timeout=timeout).result()
+        return True